@@ -0,0 +1,23 @@
+"""add_chat_history_session_index
+
+Revision ID: fd46f04df9c1
+Revises: ed5813e7dda5
+Create Date: 2025-10-15 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'fd46f04df9c1'
+down_revision = 'ed5813e7dda5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_chat_session_namespace_created_id', 'chat_history', ['session_id', 'namespace', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_chat_session_namespace_created_id', table_name='chat_history')
@@ -0,0 +1,49 @@
+"""add_unique_active_content_hash
+
+Revision ID: 3c9e1b7a52d4
+Revises: fd46f04df9c1
+Create Date: 2025-10-15 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1b7a52d4'
+down_revision = 'fd46f04df9c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Раньше повторная загрузка того же файла создавала второй активный
+    # документ. Перед созданием индекса оставляем активным самый ранний
+    # из дубликатов, остальные мягко удаляем (векторы в Qdrant миграция
+    # не трогает).
+    op.execute(sa.text(
+        """
+        UPDATE documents SET is_active = false
+        WHERE is_active
+          AND content_hash IS NOT NULL
+          AND id NOT IN (
+              SELECT MIN(id) FROM documents
+              WHERE is_active AND content_hash IS NOT NULL
+              GROUP BY namespace, content_hash
+          )
+        """
+    ))
+    
+    # Уникальность только среди активных документов: мягко удаленный
+    # документ можно загрузить повторно
+    op.create_index(
+        'uq_documents_namespace_content_hash',
+        'documents',
+        ['namespace', 'content_hash'],
+        unique=True,
+        postgresql_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_documents_namespace_content_hash', table_name='documents')
@@ -0,0 +1,24 @@
+"""add_documents_full_text
+
+Revision ID: 9b2f4e6d1a37
+Revises: 3c9e1b7a52d4
+Create Date: 2025-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2f4e6d1a37'
+down_revision = '3c9e1b7a52d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('full_text', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('documents', 'full_text')
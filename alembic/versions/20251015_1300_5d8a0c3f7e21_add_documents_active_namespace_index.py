@@ -0,0 +1,23 @@
+"""add_documents_active_namespace_index
+
+Revision ID: 5d8a0c3f7e21
+Revises: 9b2f4e6d1a37
+Create Date: 2025-10-15 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8a0c3f7e21'
+down_revision = '9b2f4e6d1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_documents_active_namespace', 'documents', ['is_active', 'namespace'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_documents_active_namespace', table_name='documents')
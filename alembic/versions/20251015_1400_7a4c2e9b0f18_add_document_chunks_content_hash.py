@@ -0,0 +1,24 @@
+"""add_document_chunks_content_hash
+
+Revision ID: 7a4c2e9b0f18
+Revises: 5d8a0c3f7e21
+Create Date: 2025-10-15 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c2e9b0f18'
+down_revision = '5d8a0c3f7e21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('document_chunks', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('document_chunks', 'content_hash')
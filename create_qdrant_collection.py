@@ -1,57 +1,82 @@
 #!/usr/bin/env python3
 """Создание коллекции docs_v2 в Qdrant"""
 
+import logging
+import os
+
 import qdrant_client
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import (
+    Distance,
+    HnswConfigDiff,
+    VectorParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+)
+
+log = logging.getLogger("qdrant_collection")
 
 def create_docs_collection():
     try:
-        print("🔌 Подключаемся к Qdrant...")
+        log.info("🔌 Подключаемся к Qdrant...")
         
         client = qdrant_client.QdrantClient(
             host="localhost",
             port=6333,
+            grpc_port=6334,
             timeout=10,
-            prefer_grpc=False
+            prefer_grpc=True
         )
         
         collection_name = "docs_v2"
+        dot_distance = os.getenv("QDRANT_DOT_DISTANCE", "false").lower() == "true"
+        vectors_on_disk = os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() == "true"
         
         # Удаляем если существует (для чистого теста)
         try:
             client.delete_collection(collection_name)
-            print(f"🗑️ Удалена существующая коллекция '{collection_name}'")
+            log.info(f"🗑️ Удалена существующая коллекция '{collection_name}'")
         except:
             pass
         
         # Создаем коллекцию
-        print(f"🆕 Создаем коллекцию '{collection_name}'...")
+        log.info(f"🆕 Создаем коллекцию '{collection_name}'...")
         client.create_collection(
             collection_name=collection_name,
             vectors_config=VectorParams(
                 size=1536,  # Azure OpenAI embedding size
-                distance=Distance.COSINE
-            )
+                # Azure OpenAI эмбеддинги нормализованы: DOT = COSINE без вычисления норм
+                distance=Distance.DOT if dot_distance else Distance.COSINE,
+                on_disk=vectors_on_disk  # На диск — только если датасет больше RAM
+            ),
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            ),
+            hnsw_config=HnswConfigDiff(on_disk=False)  # Граф HNSW в RAM
         )
         
         # Проверяем что создалась
         info = client.get_collection(collection_name)
-        print(f"✅ Коллекция '{collection_name}' создана успешно!")
-        print(f"   📊 Размер векторов: {info.config.params.vectors.size}")
-        print(f"   📏 Метрика расстояния: {info.config.params.vectors.distance}")
-        print(f"   📈 Векторов в коллекции: {info.vectors_count}")
+        log.info(f"✅ Коллекция '{collection_name}' создана успешно!")
+        log.info(f"   📊 Размер векторов: {info.config.params.vectors.size}")
+        log.info(f"   📏 Метрика расстояния: {info.config.params.vectors.distance}")
+        log.info(f"   🗜️ Квантование: {info.config.quantization_config}")
+        log.info(f"   📈 Векторов в коллекции: {info.vectors_count}")
         
         return True
         
-    except Exception as e:
-        print(f"❌ Ошибка: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("❌ Ошибка создания коллекции")
         return False
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     success = create_docs_collection()
     if success:
-        print("\n✅ Готово! Можно тестировать LlamaIndex с Qdrant")
+        log.info("✅ Готово! Можно тестировать LlamaIndex с Qdrant")
     else:
-        print("\n❌ Не удалось создать коллекцию") 
\ No newline at end of file
+        log.error("❌ Не удалось создать коллекцию") 
\ No newline at end of file
@@ -3,15 +3,19 @@ API endpoints для чата с документами.
 """
 
 from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
+from sse_starlette import EventSourceResponse
 
 from ..database.connection import get_db
 from ..services.llama_service import LlamaIndexService
 
 router = APIRouter()
 
+# Максимум вопросов в одном пакетном запросе
+MAX_QUERY_BATCH_SIZE = 32
+
 
 class ChatRequest(BaseModel):
     """Модель запроса для чата."""
@@ -42,6 +46,12 @@ class QueryResponse(BaseModel):
     search_time_ms: Optional[float] = None
 
 
+class QueryBatchRequest(BaseModel):
+    """Модель пакетного запроса: несколько независимых вопросов."""
+    questions: List[str] = Field(..., min_length=1, max_length=MAX_QUERY_BATCH_SIZE)
+    namespace: Optional[str] = None
+
+
 def get_llama_service(db: Session = Depends(get_db)) -> LlamaIndexService:
     """Dependency для получения LlamaIndex сервиса."""
     return LlamaIndexService(db)
@@ -67,6 +77,34 @@ async def chat_with_documents(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_with_documents_stream(
+    request: ChatRequest,
+    service: LlamaIndexService = Depends(get_llama_service)
+):
+    """
+    Чат с документами с потоковой выдачей ответа (Server-Sent Events).
+    События: token — фрагмент ответа, chat_complete — источники, error — ошибка.
+    """
+    async def _events():
+        try:
+            async for event in service.chat_stream(
+                message=request.message,
+                namespace=request.namespace or "default",
+                session_id=request.session_id
+            ):
+                yield event
+        finally:
+            # Сессия живет дольше обработчика, пока отдается ответ
+            service.db.close()
+    
+    return EventSourceResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
 @router.post("/query", response_model=QueryResponse)
 async def query_documents(
     request: QueryRequest,
@@ -86,20 +124,49 @@ async def query_documents(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/query/batch", response_model=List[QueryResponse])
+async def query_documents_batch(
+    request: QueryBatchRequest,
+    service: LlamaIndexService = Depends(get_llama_service)
+):
+    """
+    Несколько независимых запросов за один вызов: общий батч эмбеддингов
+    и один поиск в Qdrant вместо отдельного round-trip на каждый вопрос.
+    """
+    try:
+        results = await service.query_batch(
+            questions=request.questions,
+            namespace=request.namespace or "default"
+        )
+        return [QueryResponse(**result) for result in results]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/history")
 async def get_chat_history(
+    response: Response,
     session_id: Optional[str] = None,
     namespace: Optional[str] = None,
     limit: int = 50,
+    before: Optional[str] = None,
     service: LlamaIndexService = Depends(get_llama_service)
 ):
-    """Получение истории чатов."""
+    """
+    Получение истории чатов (не более 200 записей за запрос).
+    Курсор следующей страницы — в поле next_cursor (дублируется в заголовке X-Next-Cursor).
+    """
     try:
-        history = await service.get_chat_history(
+        page = await service.get_chat_history(
             session_id=session_id,
             namespace=namespace,
-            limit=limit
+            limit=limit,
+            before=before
         )
-        return {"history": history}
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return {"history": page["history"], "next_cursor": page["next_cursor"]}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
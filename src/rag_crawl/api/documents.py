@@ -2,8 +2,10 @@
 API endpoints для управления документами.
 """
 
-from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+import json
+from typing import Optional, List, Dict, Any, Iterator
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -84,13 +86,24 @@ async def upload_document(
 
 @router.get("/", response_model=List[DocumentResponse])
 async def get_documents(
+    response: Response,
     namespace: Optional[str] = None,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
     service: LlamaIndexService = Depends(get_llama_service)
 ):
-    """Получение списка документов."""
+    """
+    Получение списка документов.
+    Без limit возвращаются все документы; с limit (не более 1000) курсор
+    следующей страницы возвращается в заголовке X-Next-Cursor.
+    """
     try:
-        documents = await service.get_documents(namespace=namespace)
-        return [DocumentResponse(**doc) for doc in documents]
+        page = await service.get_documents(namespace=namespace, limit=limit, before=before)
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return [DocumentResponse(**doc) for doc in page["documents"]]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -115,9 +128,24 @@ async def get_document_content(
 @router.get("/{document_id}/chunks")
 async def get_document_chunks(
     document_id: int,
+    stream: bool = False,
     service: LlamaIndexService = Depends(get_llama_service)
 ):
-    """Получить все чанки документа."""
+    """
+    Получить все чанки документа.
+    С stream=true чанки отдаются построчно в формате JSON Lines.
+    """
+    if stream:
+        def _chunks_ndjson() -> Iterator[str]:
+            try:
+                for chunk in service.iter_document_chunks(document_id):
+                    yield json.dumps(chunk, ensure_ascii=False) + "\n"
+            finally:
+                # Сессия живет дольше обработчика, пока отдается ответ
+                service.db.close()
+        
+        return StreamingResponse(_chunks_ndjson(), media_type="application/x-ndjson")
+    
     try:
         chunks = await service.get_document_chunks(document_id)
         return {"chunks": chunks}
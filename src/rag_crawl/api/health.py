@@ -8,11 +8,11 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-import qdrant_client
 from typing import Dict, Any
 
 from ..config import settings
 from ..database.connection import SessionLocal
+from ..services.llama_service import get_qdrant_client
 
 router = APIRouter()
 
@@ -52,13 +52,8 @@ async def check_qdrant() -> Dict[str, Any]:
     try:
         start_time = time.time()
         
-        client = qdrant_client.QdrantClient(
-            host=settings.qdrant_host,
-            port=settings.qdrant_port
-        )
-        
-        # Проверка здоровья Qdrant
-        collections = client.get_collections()
+        # Проверка здоровья Qdrant через общий клиент приложения
+        collections = get_qdrant_client().get_collections()
         
         response_time = (time.time() - start_time) * 1000
         
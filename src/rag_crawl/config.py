@@ -32,13 +32,46 @@ class Settings(BaseSettings):
     qdrant_host: str = Field(default="localhost", env="QDRANT_HOST")
     qdrant_port: int = Field(default=6333, env="QDRANT_PORT")
     qdrant_collection_name: str = Field(default="docs_v2", env="QDRANT_COLLECTION_NAME")
+    # gRPC передает векторы бинарным protobuf вместо JSON-массивов float
+    qdrant_prefer_grpc: bool = Field(default=True, env="QDRANT_PREFER_GRPC")
+    qdrant_grpc_port: int = Field(default=6334, env="QDRANT_GRPC_PORT")
+    # HTTPS для REST включает HTTP/2: параллельные запросы в одном соединении
+    qdrant_https: bool = Field(default=False, env="QDRANT_HTTPS")
+    qdrant_timeout: int = Field(default=30, env="QDRANT_TIMEOUT")
+    # Эмбеддинги Azure OpenAI нормализованы: DOT дает тот же порядок, что и
+    # COSINE, без вычисления норм. Применяется только при создании коллекции
+    qdrant_dot_distance: bool = Field(default=False, env="QDRANT_DOT_DISTANCE")
+    # Оригиналы векторов на диске — только если датасет не помещается в RAM:
+    # rescore после int8 поиска читает их на каждый запрос
+    qdrant_vectors_on_disk: bool = Field(default=False, env="QDRANT_VECTORS_ON_DISK")
     
     # Application Configuration
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     max_chunk_size: int = Field(default=1024, env="MAX_CHUNK_SIZE")
     chunk_overlap: int = Field(default=200, env="CHUNK_OVERLAP")
+    embed_batch_size: int = Field(default=100, env="EMBED_BATCH_SIZE")
+    # SQLite кэш эмбеддингов по sha256(модель + текст); None = отключен
+    embedding_cache_path: Optional[str] = Field(default=None, env="EMBEDDING_CACHE_PATH")
     max_retrieval_results: int = Field(default=3, env="MAX_RETRIEVAL_RESULTS")
+    similarity_cutoff: float = Field(default=0.75, env="SIMILARITY_CUTOFF")
+    # Реранкинг (например BAAI/bge-reranker-base, требует sentence-transformers)
+    reranker_model: Optional[str] = Field(default=None, env="RERANKER_MODEL")
+    rerank_candidates: int = Field(default=50, env="RERANK_CANDIDATES")
+    rerank_similarity_cutoff: float = Field(default=0.6, env="RERANK_SIMILARITY_CUTOFF")
+    rerank_top_n: int = Field(default=10, env="RERANK_TOP_N")
+    
+    # Семантический кэш ответов query (по умолчанию выключен)
+    semantic_cache_enabled: bool = Field(default=False, env="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(default=0.97, env="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_size: int = Field(default=1024, env="SEMANTIC_CACHE_SIZE")
+    semantic_cache_ttl_seconds: int = Field(default=3600, env="SEMANTIC_CACHE_TTL_SECONDS")
+    # LRU эмбеддингов вопросов: повторный вопрос не идет в embedding API
+    query_embedding_cache_size: int = Field(default=1024, env="QUERY_EMBEDDING_CACHE_SIZE")
     max_file_size_mb: int = Field(default=100, env="MAX_FILE_SIZE_MB")
+    reindex_concurrency: int = Field(default=4, env="REINDEX_CONCURRENCY")
+    # Асинхронная индексация чанков: размер пачки и параллельные запросы
+    index_batch_size: int = Field(default=32, env="INDEX_BATCH_SIZE")
+    index_concurrency: int = Field(default=2, env="INDEX_CONCURRENCY")
     
     # FastAPI Configuration
     app_host: str = Field(default="0.0.0.0", env="APP_HOST")
@@ -16,8 +16,8 @@ from sqlalchemy import (
     Index,
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql import func, text
 
 Base = declarative_base()
 
@@ -33,6 +33,8 @@ class Document(Base):
     namespace = Column(String(255), nullable=False)
     source_url = Column(Text, nullable=True)
     content_hash = Column(String(64), nullable=False)  # SHA256 для обнаружения изменений
+    # Исходный очищенный текст для переиндексации (загружается только по запросу)
+    full_text = deferred(Column(Text, nullable=True))
     vector_id = Column(String(255), nullable=True)  # UUID для связи с Qdrant
     chunks_count = Column(Integer, default=0)  # Количество chunks
     metadata_json = Column("metadata", JSON, nullable=True)  # Дополнительные метаданные
@@ -59,6 +61,14 @@ class Document(Base):
         Index("idx_documents_source_url", "source_url"),
         Index("idx_documents_crawl_task_id", "crawl_task_id"),
         Index("idx_documents_namespace_source", "namespace", "source_type"),
+        Index("idx_documents_active_namespace", "is_active", "namespace"),
+        Index(
+            "uq_documents_namespace_content_hash",
+            "namespace",
+            "content_hash",
+            unique=True,
+            postgresql_where=text("is_active"),
+        ),
     )
     
     def __repr__(self) -> str:
@@ -75,6 +85,7 @@ class DocumentChunk(Base):
     chunk_index = Column(Integer, nullable=False)  # Порядковый номер chunk'а в документе
     content = Column(Text, nullable=False)  # Текстовое содержимое chunk'а
     vector_id = Column(String(255), unique=True, nullable=False)  # UUID для Qdrant
+    content_hash = Column(String(64), nullable=True)  # SHA256 чанка с метаданными (для инкрементальной переиндексации)
     metadata_json = Column("metadata", JSON, nullable=True)  # Метаданные chunk'а
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -110,6 +121,7 @@ class ChatHistory(Base):
         Index("idx_chat_session_id", "session_id"),
         Index("idx_chat_namespace", "namespace"),
         Index("idx_chat_created_at", "created_at"),
+        Index("idx_chat_session_namespace_created_id", "session_id", "namespace", "created_at", "id"),
     )
     
     def __repr__(self) -> str:
@@ -14,6 +14,7 @@ import os
 from .config import settings
 from .database.connection import create_tables
 from .api import chat, documents, health, crawl
+from .services.llama_service import warmup_clients
 
 # Настройка логирования
 logging.basicConfig(
@@ -34,6 +35,9 @@ async def lifespan(app: FastAPI):
     create_tables()
     logger.info("Таблицы базы данных созданы")
     
+    # Соединения с Qdrant открываем заранее (пул БД уже прогрет create_tables)
+    await warmup_clients()
+    
     logger.info(f"Сервис запущен на http://{settings.app_host}:{settings.app_port}")
     logger.info(f"API документация доступна на http://{settings.app_host}:{settings.app_port}/docs")
     logger.info(f"Frontend доступен на http://localhost:3000")
@@ -68,6 +72,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    # Курсор пагинации документов должен быть доступен из браузера
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Подключение роутеров API
@@ -230,7 +230,7 @@ class CrawlService:
             crawl_logger.info(f"Документ создан: {document.id} для URL: {page_data['url']}")
             
             # Интеграция индексации в векторную базу после создания документа
-            self._llama_service.index_document(document)
+            await self._llama_service.aindex_document(document)
             crawl_logger.info(f"Документ {document.id} проиндексирован в векторную базу")
             
         except Exception as e:
@@ -254,6 +254,9 @@ class CrawlService:
                 crawl_logger.info(f"Документ уже существует: {existing_doc.id}")
                 return existing_doc
             
+            # Очистка веб-контента; очищенный текст сохраняем для переиндексации
+            clean_content = self._clean_web_content(document_data["content"])
+            
             # Создание записи в БД
             db_document = Document(
                 title=document_data["title"],
@@ -261,6 +264,7 @@ class CrawlService:
                 namespace=document_data["namespace"],
                 source_url=document_data["source_url"],
                 content_hash=content_hash,
+                full_text=clean_content,
                 vector_id=generate_vector_id(),
                 crawl_depth=document_data.get("crawl_depth"),
                 crawl_task_id=document_data.get("crawl_task_id"),
@@ -274,7 +278,7 @@ class CrawlService:
             
             # Обработка и создание чанков
             chunks = await self._process_content_for_indexing(
-                content=document_data["content"],
+                content=clean_content,
                 document_id=db_document.id,
                 metadata=document_data.get("crawl_metadata", {})
             )
@@ -299,21 +303,18 @@ class CrawlService:
         document_id: int, 
         metadata: Dict
     ) -> List[DocumentChunk]:
-        """Разбивает веб-контент на чанки для индексации."""
-        # Очистка веб-контента
-        clean_content = self._clean_web_content(content)
-        
+        """Разбивает очищенный веб-контент на чанки для индексации."""
         # Разбивка на чанки
         chunks = self._split_into_chunks(
-            content=clean_content,
+            content=content,
             chunk_size=settings.web_content_chunk_size,
             chunk_overlap=settings.web_content_chunk_overlap
         )
         
         document_chunks = []
         for i, chunk in enumerate(chunks):
+            # Метаданные страницы хранятся в документе, в чанке только ссылки
             chunk_metadata = {
-                **metadata,
                 "chunk_index": i,
                 "chunk_type": "web_content",
                 "document_id": document_id
@@ -3,6 +3,7 @@
 Предоставляет методы для создания, получения и удаления документов.
 """
 
+import hashlib
 import logging
 import uuid
 from typing import List, Dict, Any, Optional
@@ -53,8 +54,8 @@ class DocumentService:
                 source_type="txt",
                 namespace=namespace,
                 source_url=metadata.get("source", ""),
-                content=content,
-                content_hash=str(hash(content)),
+                full_text=content,
+                content_hash=hashlib.sha256(content.encode("utf-8")).hexdigest(),
                 vector_id=str(uuid.uuid4()),
                 chunks_count=max(1, len(content) // settings.max_chunk_size),
                 metadata_json=metadata
@@ -0,0 +1,106 @@
+"""
+Дисковый кэш эмбеддингов (SQLite).
+Повторные тексты — те же чанки и вопросы — не отправляются в embedding API
+и между перезапусками процесса.
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+# Лимит параметров одного SQL запроса (SQLITE_MAX_VARIABLE_NUMBER в старых сборках — 999)
+LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    Кэш векторов по ключу sha256(модель + текст).
+    Векторы хранятся как float16 байты (вдвое меньше float32) и при чтении
+    приводятся к float32: относительная погрешность ~5e-4 не меняет ранжирование
+    поиска. Соединение общее для потоков процесса.
+    """
+
+    def __init__(self, path: str):
+        """Открытие (или создание) базы кэша."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # WAL: чтение не блокируется записью другого воркера
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # Таблица embeddings хранила float32 — прочитать ее как float16 нельзя
+        self._connection.execute("DROP TABLE IF EXISTS embeddings")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings_f16 (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self._connection.commit()
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self,
+        texts: List[str],
+        model: str,
+        compute_fn: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """Векторы текстов: найденные в кэше + недостающие одним вызовом compute_fn."""
+        hashes = self._hashes(texts, model)
+        cached = self._lookup(hashes)
+        missing = [i for i, text_hash in enumerate(hashes) if text_hash not in cached]
+        if missing:
+            computed = compute_fn([texts[i] for i in missing])
+            self._store(hashes, missing, computed, cached)
+        return [cached[text_hash] for text_hash in hashes]
+
+    async def aget_or_compute(
+        self,
+        texts: List[str],
+        model: str,
+        compute_fn: Callable[[List[str]], Awaitable[List[List[float]]]]
+    ) -> List[List[float]]:
+        """Асинхронный вариант get_or_compute: SQLite запросы идут в пуле потоков."""
+        hashes = self._hashes(texts, model)
+        cached = await asyncio.to_thread(self._lookup, hashes)
+        missing = [i for i, text_hash in enumerate(hashes) if text_hash not in cached]
+        if missing:
+            computed = await compute_fn([texts[i] for i in missing])
+            await asyncio.to_thread(self._store, hashes, missing, computed, cached)
+        return [cached[text_hash] for text_hash in hashes]
+
+    @staticmethod
+    def _hashes(texts: List[str], model: str) -> List[bytes]:
+        return [hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest() for text in texts]
+
+    def _lookup(self, hashes: List[bytes]) -> Dict[bytes, List[float]]:
+        unique = list(dict.fromkeys(hashes))
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(unique), LOOKUP_BATCH_SIZE):
+                batch = unique[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT hash, vec FROM embeddings_f16 WHERE hash IN ({placeholders})", batch
+                )
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float16).astype(np.float32).tolist()
+        return found
+
+    def _store(
+        self,
+        hashes: List[bytes],
+        missing: List[int],
+        computed: List[List[float]],
+        cached: Dict[bytes, List[float]]
+    ) -> None:
+        """Запись новых векторов в базу и в словарь результатов cached."""
+        rows = []
+        for i, embedding in zip(missing, computed):
+            cached[hashes[i]] = embedding
+            rows.append((hashes[i], np.asarray(embedding, dtype=np.float16).tobytes()))
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings_f16 (hash, vec) VALUES (?, ?)", rows
+            )
+            self._connection.commit()
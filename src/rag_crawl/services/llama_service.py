@@ -3,30 +3,349 @@
 Использует встроенные компоненты LlamaIndex для RAG функциональности.
 """
 
+import asyncio
+import base64
+import hashlib
+import io
+import json
 import logging
+import re
+import threading
 import time
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from itertools import islice
+from datetime import datetime
+from typing import AsyncGenerator, ClassVar, List, Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
 import uuid
+from collections import OrderedDict
 
-from llama_index.core import VectorStoreIndex, Document, StorageContext, Settings
+import httpx
+import numpy as np
+from llama_index.core import VectorStoreIndex, Document, StorageContext, Settings, get_response_synthesizer
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import (
+    BaseNode,
+    MetadataMode,
+    NodeRelationship,
+    NodeWithScore,
+    QueryBundle,
+    RelatedNodeInfo,
+    TextNode,
+)
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.postprocessor import SimilarityPostprocessor
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
 from llama_index.core.ingestion import IngestionPipeline
 from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
 from llama_index.llms.azure_openai import AzureOpenAI
 from llama_index.vector_stores.qdrant import QdrantVectorStore
 import qdrant_client
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    HasIdCondition,
+    HnswConfigDiff,
+    MatchValue,
+    QueryRequest,
+    VectorParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+)
 from fastapi import UploadFile
+from sqlalchemy import Text, cast, func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sse_starlette import ServerSentEvent
 
 from ..config import settings
+from ..database.connection import SessionLocal
 from ..database.models import Document as DBDocument, ChatHistory, DocumentChunk
 from ..utils.text_processing import extract_text_from_file, clean_text, sanitize_filename
+from .embed_cache import EmbeddingCache
+from .semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# Максимальный размер страницы истории чатов
+MAX_CHAT_HISTORY_LIMIT = 200
+MAX_DOCUMENTS_PAGE_LIMIT = 1000
+
+# Категории документов по расширению файла
+SOURCE_TYPE_CATEGORIES = {
+    "md": "documentation",
+    "markdown": "documentation",
+    "pdf": "document",
+    "txt": "text",
+    "html": "web_page",
+    "htm": "web_page",
+    "docx": "office_document",
+    "doc": "office_document",
+}
+
+# Категории по ключевым словам в заголовке (порядок проверки важен)
+TITLE_KEYWORD_CATEGORIES = (
+    ("documentation", frozenset({"readme", "документация", "инструкция", "guide"})),
+    ("reference", frozenset({"api", "reference", "spec"})),
+    ("tutorial", frozenset({"tutorial", "урок", "обучение"})),
+    ("article", frozenset({"новости", "news", "статья", "article"})),
+    ("report", frozenset({"отчет", "report", "анализ"})),
+)
+
+CODE_MARKERS_RE = re.compile(r"```|def |function ")
+HEADER_RE = re.compile(r"\n#")
+
+# Служебные поля метаданных узла, которые не должны попадать в эмбеддинги и промпт
+NODE_METADATA_EXCLUDED_KEYS = ["document_id", "namespace"]
+
+
+# Кэш ответов общий для всех экземпляров сервиса (они создаются на каждый запрос)
+_semantic_cache: Optional[SemanticCache] = (
+    SemanticCache(
+        max_size=settings.semantic_cache_size,
+        threshold=settings.semantic_cache_threshold,
+        ttl_seconds=settings.semantic_cache_ttl_seconds,
+    )
+    if settings.semantic_cache_enabled
+    else None
+)
+
+# LRU эмбеддингов вопросов: (модель, текст) -> вектор
+_query_embeddings: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+_query_embeddings_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _get_llm() -> AzureOpenAI:
+    """LLM Azure OpenAI, один экземпляр на процесс."""
+    llm = AzureOpenAI(
+        model=settings.azure_openai_chat_model,  # Используем переменную из environment
+        deployment_name=settings.azure_openai_chat_deployment,
+        api_key=settings.azure_openai_api_key,
+        azure_endpoint=settings.azure_openai_endpoint,
+        api_version=settings.azure_openai_api_version,
+        temperature=0.1,
+    )
+    logger.info("LlamaIndex настроен с Azure OpenAI")
+    return llm
+
+
+class CachedAzureOpenAIEmbedding(AzureOpenAIEmbedding):
+    """AzureOpenAIEmbedding с дисковым кэшем векторов: в API уходят только новые тексты."""
+
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, cache: EmbeddingCache, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._cache = cache
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        compute = super()._get_query_embedding
+        return self._cache.get_or_compute(
+            [query], self.model_name, lambda texts: [compute(texts[0])]
+        )[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        compute = super()._aget_query_embedding
+        
+        async def _compute(texts: List[str]) -> List[List[float]]:
+            return [await compute(texts[0])]
+        
+        return (await self._cache.aget_or_compute([query], self.model_name, _compute))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cache.get_or_compute(texts, self.model_name, super()._get_text_embeddings)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._cache.aget_or_compute(texts, self.model_name, super()._aget_text_embeddings)
+
+
+@lru_cache(maxsize=1)
+def _get_embed_model() -> AzureOpenAIEmbedding:
+    """Embedding модель Azure OpenAI, один экземпляр на процесс."""
+    # Крупные батчи (Azure принимает до 2048 входов за вызов)
+    # и общий пул HTTP/2 соединений с keep-alive
+    http_limits = httpx.Limits(max_connections=64)
+    
+    # С дисковым кэшем повторные тексты не идут в API и после перезапуска
+    extra_kwargs: Dict[str, Any] = {}
+    embed_class = AzureOpenAIEmbedding
+    if settings.embedding_cache_path:
+        embed_class = CachedAzureOpenAIEmbedding
+        extra_kwargs["cache"] = EmbeddingCache(settings.embedding_cache_path)
+    
+    return embed_class(
+        model=settings.azure_openai_embedding_model,  # Используем переменную из environment
+        deployment_name=settings.azure_openai_embedding_deployment,
+        api_key=settings.azure_openai_api_key,
+        azure_endpoint=settings.azure_openai_endpoint,
+        api_version=settings.azure_openai_api_version,
+        embed_batch_size=settings.embed_batch_size,
+        http_client=httpx.Client(http2=True, limits=http_limits),
+        async_http_client=httpx.AsyncClient(http2=True, limits=http_limits),
+        **extra_kwargs
+    )
+
+
+@lru_cache(maxsize=1)
+def get_qdrant_client() -> qdrant_client.QdrantClient:
+    """Клиент Qdrant, один экземпляр на процесс (клиент потокобезопасен)."""
+    return qdrant_client.QdrantClient(
+        host=settings.qdrant_host,    # localhost
+        port=settings.qdrant_port,    # 6333
+        grpc_port=settings.qdrant_grpc_port,  # 6334
+        https=settings.qdrant_https,
+        http2=settings.qdrant_https,  # HTTP/2 для REST только поверх TLS
+        timeout=settings.qdrant_timeout,  # Таймаут соединения
+        prefer_grpc=settings.qdrant_prefer_grpc  # gRPC: векторы без JSON
+    )
+
+
+def _encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Курсор keyset-пагинации: позиция (created_at, id) последней строки."""
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), row_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбор курсора пагинации; ValueError для некорректного значения."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Некорректный курсор пагинации: {cursor}") from e
+
+
+# Пространство имен для детерминированных ID документов LlamaIndex
+LLAMA_DOC_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "rag_crawl/documents")
+
+@lru_cache(maxsize=1)
+def get_async_qdrant_client() -> qdrant_client.AsyncQdrantClient:
+    """Асинхронный клиент Qdrant с теми же настройками, один на процесс."""
+    return qdrant_client.AsyncQdrantClient(
+        host=settings.qdrant_host,
+        port=settings.qdrant_port,
+        grpc_port=settings.qdrant_grpc_port,
+        https=settings.qdrant_https,
+        http2=settings.qdrant_https,
+        timeout=settings.qdrant_timeout,
+        prefer_grpc=settings.qdrant_prefer_grpc
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_shared_vector_store() -> QdrantVectorStore:
+    """
+    Qdrant векторное хранилище, одно на процесс (исправлено согласно документации LlamaIndex).
+    Проверка и создание коллекции выполняются один раз, а не на каждый запрос.
+    """
+    try:
+        client = get_qdrant_client()
+        
+        # Проверяем существование коллекции и создаем если нужно
+        collection_name = settings.qdrant_collection_name
+        try:
+            client.get_collection(collection_name)
+            logger.info(f"✅ Коллекция '{collection_name}' уже существует")
+        except Exception:
+            # Коллекция не существует, создаем её.
+            # В RAM держим int8-квантованную копию для поиска; оригинальные FP32
+            # векторы (нужны для rescore) уходят на диск только по настройке.
+            client.create_collection(
+                collection_name=collection_name,
+                vectors_config=VectorParams(
+                    size=1536,  # Размер векторов Azure OpenAI embeddings
+                    distance=Distance.DOT if settings.qdrant_dot_distance else Distance.COSINE,
+                    on_disk=settings.qdrant_vectors_on_disk
+                ),
+                quantization_config=ScalarQuantization(
+                    scalar=ScalarQuantizationConfig(
+                        type=ScalarType.INT8,
+                        quantile=0.99,  # Отсекаем выбросы при калибровке
+                        always_ram=True
+                    )
+                ),
+                # Граф HNSW явно в RAM: обход графа не должен читать диск
+                hnsw_config=HnswConfigDiff(on_disk=False)
+            )
+            logger.info(f"✅ Создана новая коллекция '{collection_name}'")
+        
+        vector_store = QdrantVectorStore(
+            client=client,
+            aclient=get_async_qdrant_client(),
+            collection_name=collection_name
+        )
+        
+        logger.info(f"✅ Используется QdrantVectorStore: {settings.qdrant_host}:{settings.qdrant_port}/{collection_name}")
+        return vector_store
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка подключения к Qdrant: {e}")
+        raise
+
+
+async def warmup_clients() -> None:
+    """
+    Прогрев клиентов при старте приложения: коллекция проверяется, а gRPC
+    каналы Qdrant открываются до первого запроса, а не внутри него.
+    """
+    try:
+        await asyncio.to_thread(_get_shared_vector_store)
+        await asyncio.to_thread(get_qdrant_client().get_collections)
+        await get_async_qdrant_client().get_collections()
+        logger.info("✅ Клиенты Qdrant прогреты")
+    except Exception as e:
+        # Недоступный Qdrant не должен мешать старту: health покажет ошибку
+        logger.warning(f"⚠️ Не удалось прогреть клиенты Qdrant: {e}")
+
+
+@lru_cache(maxsize=1)
+def _get_splitter() -> SentenceSplitter:
+    """Сплиттер чанков, общий для процесса (токенизатор загружается один раз)."""
+    return SentenceSplitter(
+        chunk_size=settings.max_chunk_size,    # 1024
+        chunk_overlap=settings.chunk_overlap   # 200
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_ingest_pipeline() -> IngestionPipeline:
+    """IngestionPipeline: чанкинг + эмбеддинги + запись в Qdrant, один на процесс."""
+    return IngestionPipeline(
+        transformations=[_get_splitter(), _get_embed_model()],
+        vector_store=_get_shared_vector_store(),
+        # Кэш трансформаций общего pipeline рос бы с каждым документом
+        disable_cache=True,
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_embed_pipeline() -> IngestionPipeline:
+    """IngestionPipeline для готовых узлов: только эмбеддинги + запись в Qdrant."""
+    return IngestionPipeline(
+        transformations=[_get_embed_model()],
+        vector_store=_get_shared_vector_store(),
+        disable_cache=True,
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_reranker() -> Optional[BaseNodePostprocessor]:
+    """Cross-encoder реранкер, загружается один раз на процесс (опционально)."""
+    if not settings.reranker_model:
+        return None
+    
+    # Требует sentence-transformers, поэтому импортируем только при включении
+    from llama_index.core.postprocessor import SentenceTransformerRerank
+    
+    logger.info(f"Загрузка реранкера: {settings.reranker_model}")
+    return SentenceTransformerRerank(
+        model=settings.reranker_model,
+        top_n=settings.rerank_top_n,
+        keep_retrieval_score=True
+    )
+
 
 class LlamaIndexService:
     """
@@ -34,121 +353,130 @@ class LlamaIndexService:
     Использует встроенные возможности для максимальной эффективности.
     """
 
+    # Глобальные Settings LlamaIndex настраиваются один раз на процесс
+    _bootstrapped: ClassVar[bool] = False
+
     def __init__(self, db: Session):
         """Инициализация сервиса."""
         self.db = db
         self._vector_store = None
         self._indices = {}  # Кэш индексов по namespace
-        self._chat_engines = {}  # Кэш chat engines по namespace
+        self._chat_engines: Dict[str, Dict[str, Any]] = {}  # Кэш chat engines: namespace -> session_id -> engine
         self._setup_llama_index()
         
     def _setup_llama_index(self):
         """Настройка глобальных параметров LlamaIndex."""
-        # Настройка LLM - используем AzureOpenAI
-        self.llm = AzureOpenAI(
-            model=settings.azure_openai_chat_model,  # Используем переменную из environment
-            deployment_name=settings.azure_openai_chat_deployment,
-            api_key=settings.azure_openai_api_key,
-            azure_endpoint=settings.azure_openai_endpoint,
-            api_version=settings.azure_openai_api_version,
-            temperature=0.1,
-        )
+        # Клиенты общие для процесса: сервис создается на каждый запрос,
+        # а повторное использование сохраняет keep-alive соединения
+        self.llm = _get_llm()
+        self.embed_model = _get_embed_model()
         
-        # Настройка Embedding модели
-        self.embed_model = AzureOpenAIEmbedding(
-            model=settings.azure_openai_embedding_model,  # Используем переменную из environment
-            deployment_name=settings.azure_openai_embedding_deployment,
-            api_key=settings.azure_openai_api_key,
-            azure_endpoint=settings.azure_openai_endpoint,
-            api_version=settings.azure_openai_api_version,
-        )
+        if LlamaIndexService._bootstrapped:
+            return
         
         # Настройка глобальных параметров через Settings
         Settings.llm = self.llm
         Settings.embed_model = self.embed_model
-        Settings.node_parser = SentenceSplitter(
-            chunk_size=settings.max_chunk_size,
-            chunk_overlap=settings.chunk_overlap
-        )
+        Settings.node_parser = _get_splitter()
         
-        logger.info("LlamaIndex настроен с Azure OpenAI")
+        LlamaIndexService._bootstrapped = True
     
     def _detect_document_category(self, title: str, source_type: str, content: str) -> str:
         """Автоматически определяет категорию документа по содержимому."""
-        title_lower = title.lower()
-        content_lower = content.lower()
-        
-        # Определяем по расширению файла
-        if source_type in ['md', 'markdown']:
-            return "documentation"
-        elif source_type in ['pdf']:
-            return "document"
-        elif source_type in ['txt']:
-            return "text"
-        elif source_type in ['html', 'htm']:
-            return "web_page"
-        elif source_type in ['docx', 'doc']:
-            return "office_document"
+        # Определяем по расширению файла — содержимое не читаем вовсе
+        category = SOURCE_TYPE_CATEGORIES.get(source_type)
+        if category:
+            return category
         
         # Определяем по ключевым словам в заголовке
-        if any(word in title_lower for word in ['readme', 'документация', 'инструкция', 'guide']):
-            return "documentation"
-        elif any(word in title_lower for word in ['api', 'reference', 'spec']):
-            return "reference"
-        elif any(word in title_lower for word in ['tutorial', 'урок', 'обучение']):
-            return "tutorial"
-        elif any(word in title_lower for word in ['новости', 'news', 'статья', 'article']):
-            return "article"
-        elif any(word in title_lower for word in ['отчет', 'report', 'анализ']):
-            return "report"
+        title_lower = title.lower()
+        for category, keywords in TITLE_KEYWORD_CATEGORIES:
+            if any(word in title_lower for word in keywords):
+                return category
         
         # Определяем по содержимому
         if len(content) < 500:
             return "snippet"
-        elif '```' in content or 'def ' in content or 'function ' in content:
+        elif CODE_MARKERS_RE.search(content):
             return "code_documentation"
-        elif content.count('\n#') > 3:  # много заголовков
+        elif sum(1 for _ in islice(HEADER_RE.finditer(content), 4)) > 3:  # много заголовков
             return "structured_document"
         
         return "general"
 
-    def _get_vector_store(self) -> QdrantVectorStore:
-        """Получение Qdrant векторного хранилища (исправлено согласно документации LlamaIndex)."""
-        try:
-            client = qdrant_client.QdrantClient(
-                host=settings.qdrant_host,    # localhost
-                port=settings.qdrant_port,    # 6333
-                timeout=30,                   # Таймаут соединения
-                prefer_grpc=False            # Используем HTTP вместо gRPC
-            )
-            
-            # Проверяем существование коллекции и создаем если нужно
-            collection_name = settings.qdrant_collection_name
-            try:
-                client.get_collection(collection_name)
-                logger.info(f"✅ Коллекция '{collection_name}' уже существует")
-            except Exception:
-                # Коллекция не существует, создаем её
-                client.create_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(
-                        size=1536,  # Размер векторов Azure OpenAI embeddings
-                        distance=Distance.COSINE
-                    )
-                )
-                logger.info(f"✅ Создана новая коллекция '{collection_name}'")
-            
-            vector_store = QdrantVectorStore(
-                client=client,
-                collection_name=collection_name
+    @staticmethod
+    def _node_metadata(document: DBDocument) -> Dict[str, Any]:
+        """Минимальные метаданные узла: остальное берется из документа в БД."""
+        return {
+            "document_id": document.id,
+            "title": document.title,
+            "namespace": document.namespace,
+        }
+
+    @staticmethod
+    def _llama_doc_id(document_id: int) -> str:
+        """Детерминированный ID документа LlamaIndex (ref_doc_id узлов в Qdrant)."""
+        return str(uuid.uuid5(LLAMA_DOC_ID_NAMESPACE, str(document_id)))
+
+    @staticmethod
+    def _chunk_hash(node: BaseNode) -> str:
+        """Хэш чанка вместе с метаданными, попадающими в Qdrant."""
+        return hashlib.sha256(node.get_content(metadata_mode=MetadataMode.ALL).encode()).hexdigest()
+
+    @staticmethod
+    def _check_embeddings_normalized(nodes: List[BaseNode]) -> None:
+        """Проверка единичной нормы эмбеддингов (нужна для метрики DOT)."""
+        embeddings = [node.embedding for node in nodes if node.embedding is not None]
+        if not embeddings:
+            return
+        
+        norms = np.linalg.norm(np.asarray(embeddings, dtype=np.float32), axis=1)
+        if not np.allclose(norms, 1.0, atol=1e-3):
+            logger.warning(
+                f"⚠️ Эмбеддинги не нормализованы (норма {norms.min():.4f}..{norms.max():.4f}), "
+                f"метрика DOT даст некорректный порядок"
             )
-            
-            logger.info(f"✅ Используется QdrantVectorStore: {settings.qdrant_host}:{settings.qdrant_port}/{collection_name}")
-            return vector_store
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка подключения к Qdrant: {e}")
-            raise
+
+    def _build_text_from_chunks(self, document_id: int) -> Optional[str]:
+        """
+        Сборка текста документа из чанков (для документов без full_text).
+        Чанки читаются пачками и пишутся в буфер без промежуточного списка.
+        """
+        contents = self.db.query(DocumentChunk.content).filter(
+            DocumentChunk.document_id == document_id
+        ).order_by(DocumentChunk.chunk_index).yield_per(500)
+        
+        buffer = io.StringIO()
+        first = True
+        for (content,) in contents:
+            if not first:
+                buffer.write("\n")
+            buffer.write(content)
+            first = False
+        
+        return None if first else buffer.getvalue()
+
+    def _get_source_documents(self, source_nodes: List[Any]) -> Dict[int, Any]:
+        """Загрузка title/source_type документов-источников одним запросом."""
+        document_ids = {
+            node.metadata.get("document_id")
+            for node in source_nodes
+            if hasattr(node, 'metadata') and node.metadata.get("document_id") is not None
+        }
+        if not document_ids:
+            return {}
+        
+        rows = self.db.query(
+            DBDocument.id,
+            DBDocument.title,
+            DBDocument.source_type
+        ).filter(DBDocument.id.in_(document_ids)).all()
+        
+        return {row.id: row for row in rows}
+
+    def _get_vector_store(self) -> QdrantVectorStore:
+        """Получение Qdrant векторного хранилища (общего для процесса)."""
+        return _get_shared_vector_store()
 
     def _get_vector_store_lazy(self) -> Any:
         """Ленивая инициализация vector store."""
@@ -180,30 +508,100 @@ class LlamaIndexService:
             
         return self._indices[namespace]
 
+    @staticmethod
+    def _namespace_filter(namespace: str) -> Filter:
+        """Фильтр Qdrant по namespace — общий для всех путей поиска."""
+        return Filter(must=[FieldCondition(key="namespace", match=MatchValue(value=namespace))])
+
+    def _invalidate_namespace_cache(self, namespace: str) -> None:
+        """Сброс кэшей индекса, chat engines и ответов для namespace."""
+        self._indices.pop(namespace, None)
+        self._chat_engines.pop(namespace, None)
+        
+        if _semantic_cache is not None:
+            _semantic_cache.invalidate_namespace(namespace)
+
+    async def _get_cached_response(
+        self,
+        namespace: str,
+        text: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """
+        Поиск ответа в семантическом кэше.
+        
+        Возвращает (ответ, эмбеддинг вопроса). Эмбеддинг вычисляется только
+        если нет точного совпадения, и нужен для записи нового ответа в кэш.
+        """
+        if _semantic_cache is None:
+            return None, None
+        
+        cached = _semantic_cache.get_exact(namespace, text)
+        if cached is not None:
+            return cached, None
+        
+        query_embedding = await self._aget_query_embedding(text)
+        return _semantic_cache.get_similar(namespace, query_embedding), query_embedding
+
+    async def _aget_query_embedding(self, text: str) -> List[float]:
+        """Эмбеддинг вопроса с LRU кэшем по (модель, текст)."""
+        key = (settings.azure_openai_embedding_model, text)
+        with _query_embeddings_lock:
+            embedding = _query_embeddings.get(key)
+            if embedding is not None:
+                _query_embeddings.move_to_end(key)
+                return embedding
+        
+        embedding = await self.embed_model.aget_query_embedding(text)
+        
+        with _query_embeddings_lock:
+            _query_embeddings[key] = embedding
+            while len(_query_embeddings) > settings.query_embedding_cache_size:
+                _query_embeddings.popitem(last=False)
+        return embedding
+
+    def _get_retrieval_config(self) -> Tuple[int, List[BaseNodePostprocessor]]:
+        """
+        Параметры отбора узлов для query/chat.
+        
+        С реранкером из Qdrant забирается много дешевых кандидатов, грубо
+        отсекается по косинусу и переранжируется cross-encoder'ом до top_n.
+        Без реранкера берем top_n сразу, чтобы не раздувать контекст LLM.
+        """
+        reranker = _get_reranker()
+        if reranker is None:
+            return settings.rerank_top_n, [
+                SimilarityPostprocessor(similarity_cutoff=settings.similarity_cutoff)
+            ]
+        
+        return settings.rerank_candidates, [
+            SimilarityPostprocessor(similarity_cutoff=settings.rerank_similarity_cutoff),
+            reranker,
+        ]
+
     def _get_chat_engine(self, namespace: str, session_id: Optional[str] = None):
         """Получение chat engine для namespace с фильтрацией релевантности."""
-        cache_key = f"{namespace}:{session_id or 'default'}"
+        namespace_engines = self._chat_engines.setdefault(namespace, {})
+        cache_key = session_id or "default"
         
-        if cache_key not in self._chat_engines:
+        if cache_key not in namespace_engines:
             index = self._get_index(namespace)
             
-            # Настройка постпроцессоров для фильтрации релевантности
-            node_postprocessors = [
-                SimilarityPostprocessor(similarity_cutoff=0.75)  # Тот же фильтр что и в query
-            ]
+            # Те же параметры отбора и реранкинга, что и в query
+            similarity_top_k, node_postprocessors = self._get_retrieval_config()
             
             # Создаем chat engine с фильтрацией релевантности
             chat_engine = index.as_chat_engine(
                 chat_mode="context",
-                similarity_top_k=10,  # Увеличиваем до фильтрации
+                similarity_top_k=similarity_top_k,
                 node_postprocessors=node_postprocessors,
+                vector_store_kwargs={"qdrant_filters": self._namespace_filter(namespace)},
                 verbose=True
             )
             
-            self._chat_engines[cache_key] = chat_engine
+            namespace_engines[cache_key] = chat_engine
             logger.info(f"✅ Создан chat engine для namespace: {namespace}")
         
-        return self._chat_engines[cache_key]
+        return namespace_engines[cache_key]
 
     def _get_collection_info(self) -> Dict[str, Any]:
         """Получение информации о коллекции Qdrant."""
@@ -229,13 +627,38 @@ class LlamaIndexService:
             return {"error": str(e)}
 
     def _get_collection_points_count(self) -> int:
-        """Получение количества точек в коллекции."""
+        """
+        Получение количества точек в коллекции.
+        Приблизительный count — легкий запрос без конфигурации коллекции.
+        """
         try:
-            info = self._get_collection_info()
-            return info.get("points_count", 0)
+            return get_qdrant_client().count(
+                collection_name=settings.qdrant_collection_name,
+                exact=False
+            ).count
         except Exception:
             return 0
 
+    async def _aget_collection_points_count(self) -> int:
+        """Асинхронный вариант _get_collection_points_count."""
+        try:
+            result = await get_async_qdrant_client().count(
+                collection_name=settings.qdrant_collection_name,
+                exact=False
+            )
+            return result.count
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения количества точек: {e}")
+            return 0
+
+    def _find_active_document(self, namespace: str, content_hash: str) -> Optional[DBDocument]:
+        """Активный документ namespace с тем же содержимым (если есть)."""
+        return self.db.query(DBDocument).filter(
+            DBDocument.namespace == namespace,
+            DBDocument.content_hash == content_hash,
+            DBDocument.is_active == True
+        ).first()
+
     async def upload_document(
         self, 
         file: UploadFile, 
@@ -252,6 +675,17 @@ class LlamaIndexService:
             if not cleaned_text.strip():
                 raise ValueError("Файл не содержит текста для обработки")
             
+            # Стабильный между процессами хэш для обнаружения дубликатов
+            content_hash = hashlib.sha256(cleaned_text.encode("utf-8")).hexdigest()
+            
+            existing_document = await asyncio.to_thread(
+                self._find_active_document, namespace, content_hash
+            )
+            if existing_document:
+                # Тот же текст уже проиндексирован: пропускаем эмбеддинги и запись
+                logger.info(f"Документ уже существует: {existing_document.id}, повторная индексация пропущена")
+                return existing_document
+            
             # Создание документа LlamaIndex с богатыми метаданными
             title = sanitize_filename(file.filename or "unknown")
             source_type = Path(file.filename or "").suffix.lower()[1:] or "unknown"
@@ -259,9 +693,6 @@ class LlamaIndexService:
             # Автоматически определяем категорию документа
             document_category = self._detect_document_category(title, source_type, cleaned_text)
             
-            # Получаем количество точек до индексации
-            points_count_before = self._get_collection_points_count()
-            
             # Богатые метаданные для умной фильтрации
             rich_metadata = {
                 "title": title,
@@ -281,78 +712,86 @@ class LlamaIndexService:
                 source_type=source_type,
                 namespace=namespace,
                 source_url=file.filename,
-                content_hash=str(hash(cleaned_text)),
+                content_hash=content_hash,
+                full_text=cleaned_text,
                 vector_id=str(uuid.uuid4()),
                 chunks_count=0,  # Пока 0, обновим после создания чанков
                 metadata_json=rich_metadata
             )
             
+            # Синхронные запросы SQLAlchemy выполняем в пуле потоков,
+            # как и парсинг с эмбеддингами, чтобы не блокировать event loop
             self.db.add(db_document)
-            self.db.commit()
-            self.db.refresh(db_document)
-            
-            # Добавляем document_id в метаданные
-            rich_metadata["document_id"] = db_document.id
-            
+            try:
+                await asyncio.to_thread(self.db.commit)
+            except IntegrityError:
+                # Параллельная загрузка того же файла успела раньше
+                # (уникальный индекс по namespace + content_hash)
+                await asyncio.to_thread(self.db.rollback)
+                existing_document = await asyncio.to_thread(
+                    self._find_active_document, namespace, content_hash
+                )
+                if existing_document is None:
+                    raise
+                logger.info(f"Документ уже загружен параллельным запросом: {existing_document.id}")
+                return existing_document
+            await asyncio.to_thread(self.db.refresh, db_document)
+            
+            # Богатые метаданные хранятся только в документе; в узлы и в Qdrant
+            # уходит минимальный набор полей
             llama_doc = Document(
+                id_=self._llama_doc_id(db_document.id),
                 text=cleaned_text,
-                metadata=rich_metadata
+                metadata=self._node_metadata(db_document),
+                excluded_embed_metadata_keys=NODE_METADATA_EXCLUDED_KEYS,
+                excluded_llm_metadata_keys=NODE_METADATA_EXCLUDED_KEYS
             )
             
-            # Получаем vector store для pipeline
-            vector_store = self._get_vector_store_lazy()
-            
             logger.info(f"📊 Начинается индексация документа: {title}")
-            logger.info(f"🔍 Vector store: {type(vector_store).__name__}")
-            
-            # ✅ ИСПРАВЛЕНО: Создание pipeline для правильного чанкинга
-            pipeline = IngestionPipeline(
-                transformations=[
-                    SentenceSplitter(
-                        chunk_size=settings.max_chunk_size,    # 1024
-                        chunk_overlap=settings.chunk_overlap   # 200
-                    ),
-                    self.embed_model,
-                ],
-                vector_store=vector_store,
-            )
             
-            # Обработка документа через pipeline (это создаст правильные чанки)
-            nodes = pipeline.run(documents=[llama_doc])
+            pipeline = _get_ingest_pipeline()
+            
+            # Обработка документа через pipeline (это создаст правильные чанки).
+            # Выполняем в отдельном потоке, чтобы не блокировать event loop
+            nodes = await asyncio.to_thread(pipeline.run, documents=[llama_doc])
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                self._check_embeddings_normalized(nodes)
+            
             chunk_count = len(nodes)
             
             logger.info(f"📝 Создано чанков: {chunk_count}")
             
-            # Создаем чанки в базе данных для каждого node
-            for i, node in enumerate(nodes):
-                chunk_metadata = {**rich_metadata, "chunk_index": i}
-                chunk = DocumentChunk(
-                    document_id=db_document.id,
-                    chunk_index=i,
-                    content=node.text,
-                    vector_id=node.node_id,
-                    metadata_json=chunk_metadata
-                )
-                self.db.add(chunk)
+            chunk_rows = [
+                {
+                    "document_id": db_document.id,
+                    "chunk_index": i,
+                    "content": node.text,
+                    "vector_id": node.node_id,
+                    "content_hash": self._chunk_hash(node),
+                    "metadata_json": {"document_id": db_document.id, "chunk_index": i},
+                }
+                for i, node in enumerate(nodes)
+            ]
             
-            # Обновляем количество чанков в документе
-            db_document.chunks_count = chunk_count
-            self.db.commit()
+            def _save_chunks() -> None:
+                # Чанки одним multi-row INSERT и количество чанков в документе;
+                # refresh — чтобы вызывающий код не подгружал атрибуты в event loop
+                self.db.bulk_insert_mappings(DocumentChunk, chunk_rows)
+                db_document.chunks_count = chunk_count
+                self.db.commit()
+                self.db.refresh(db_document)
             
-            # Проверяем, что векторы действительно сохранены
-            points_count_after = self._get_collection_points_count()
-            vectors_added = points_count_after - points_count_before
+            await asyncio.to_thread(_save_chunks)
             
-            logger.info(f"✅ Векторы добавлены: {vectors_added}")
+            logger.info(f"✅ Векторы добавлены (локально): {chunk_count}")
             
-            # Очистка кэша для namespace
-            if namespace in self._indices:
-                del self._indices[namespace]
+            # Проверка по Qdrant стоит сетевого запроса, поэтому только в DEBUG
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Точек в коллекции после индексации: {self._get_collection_points_count()}")
             
-            # Очистка кэша chat engines для этого namespace
-            keys_to_remove = [k for k in self._chat_engines.keys() if k.startswith(f"{namespace}:")]
-            for key in keys_to_remove:
-                del self._chat_engines[key]
+            # Очистка кэшей для namespace
+            self._invalidate_namespace_cache(namespace)
             
             logger.info(f"✅ Документ '{title}' загружен в namespace '{namespace}', создано {chunk_count} чанков через IngestionPipeline")
             
@@ -360,20 +799,23 @@ class LlamaIndexService:
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки документа: {e}")
-            self.db.rollback()
+            await asyncio.to_thread(self.db.rollback)
             raise
 
     async def reindex_all_documents(self, namespace: Optional[str] = None) -> Dict[str, Any]:
         """Переиндексация всех документов в namespace."""
         try:
-            # Получаем все документы
-            query = self.db.query(DBDocument).filter(DBDocument.is_active == True)
+            # Получаем только id документов: reindex_document сам загружает
+            # документ, поэтому полные ORM объекты здесь не нужны. Список
+            # материализуется целиком: reindex_document коммитит ту же сессию,
+            # и открытый курсор не пережил бы commit
+            query = self.db.query(DBDocument.id).filter(DBDocument.is_active == True)
             if namespace:
                 query = query.filter(DBDocument.namespace == namespace)
             
-            documents = query.all()
+            document_ids = [row.id for row in query]
             
-            if not documents:
+            if not document_ids:
                 return {
                     "message": "Нет документов для переиндексации",
                     "namespace": namespace,
@@ -382,34 +824,32 @@ class LlamaIndexService:
             
             # Очищаем кэши
             if namespace:
-                if namespace in self._indices:
-                    del self._indices[namespace]
-                keys_to_remove = [k for k in self._chat_engines.keys() if k.startswith(f"{namespace}:")]
-                for key in keys_to_remove:
-                    del self._chat_engines[key]
+                self._invalidate_namespace_cache(namespace)
             else:
                 self._indices.clear()
                 self._chat_engines.clear()
+                if _semantic_cache is not None:
+                    _semantic_cache.clear()
             
             # Переиндексируем документы
             success_count = 0
             errors = []
             
-            for document in documents:
+            for document_id in document_ids:
                 try:
-                    result = await self.reindex_document(document.id)
+                    result = await self.reindex_document(document_id)
                     if result["success"]:
                         success_count += 1
                     else:
-                        errors.append(f"Документ {document.id}: {result.get('error', 'Неизвестная ошибка')}")
+                        errors.append(f"Документ {document_id}: {result.get('error', 'Неизвестная ошибка')}")
                 except Exception as e:
-                    errors.append(f"Документ {document.id}: {str(e)}")
+                    errors.append(f"Документ {document_id}: {str(e)}")
             
             return {
                 "message": f"Переиндексация завершена",
                 "namespace": namespace,
                 "documents_processed": success_count,
-                "total_documents": len(documents),
+                "total_documents": len(document_ids),
                 "errors": errors
             }
             
@@ -420,11 +860,13 @@ class LlamaIndexService:
     async def reindex_document(self, document_id: int) -> Dict[str, Any]:
         """Переиндексация одного документа."""
         try:
-            # Получаем документ
-            document = self.db.query(DBDocument).filter(
-                DBDocument.id == document_id,
-                DBDocument.is_active == True
-            ).first()
+            # Получаем документ (запросы к БД — в пуле потоков)
+            document = await asyncio.to_thread(
+                lambda: self.db.query(DBDocument).filter(
+                    DBDocument.id == document_id,
+                    DBDocument.is_active == True
+                ).first()
+            )
             
             if not document:
                 return {
@@ -432,99 +874,117 @@ class LlamaIndexService:
                     "error": "Документ не найден"
                 }
             
-            # Получаем чанки документа
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document_id
-            ).all()
-            
-            if not chunks:
-                return {
-                    "success": False,
-                    "error": "Чанки документа не найдены"
-                }
-            
-            # Собираем полный текст из чанков
-            full_text = "\n".join([chunk.content for chunk in chunks])
-            
-            # Создаем метаданные
-            metadata = {
-                "title": document.title,
-                "source_type": document.source_type,
-                "category": document.metadata_json.get("category", "general") if document.metadata_json else "general",
-                "namespace": document.namespace,
-                "filename": document.source_url,
-                "content_length": len(full_text),
-                "upload_source": "reindex",
-                "language": "ru",
-                "document_id": document.id
-            }
+            # Исходный текст хранится в документе; для документов, загруженных
+            # до появления full_text, собираем его из чанков
+            full_text = document.full_text
+            if full_text is None:
+                full_text = await asyncio.to_thread(self._build_text_from_chunks, document_id)
+                
+                if full_text is None:
+                    return {
+                        "success": False,
+                        "error": "Чанки документа не найдены"
+                    }
             
             # Создаем LlamaIndex документ
             llama_doc = Document(
+                id_=self._llama_doc_id(document.id),
                 text=full_text,
-                metadata=metadata
+                metadata=self._node_metadata(document),
+                excluded_embed_metadata_keys=NODE_METADATA_EXCLUDED_KEYS,
+                excluded_llm_metadata_keys=NODE_METADATA_EXCLUDED_KEYS
             )
             
-            # Получаем vector store
-            vector_store = self._get_vector_store_lazy()
-            
-            # Создаем pipeline для переиндексации
-            pipeline = IngestionPipeline(
-                transformations=[
-                    SentenceSplitter(
-                        chunk_size=settings.max_chunk_size,
-                        chunk_overlap=settings.chunk_overlap
-                    ),
-                    self.embed_model,
-                ],
-                vector_store=vector_store,
+            # Сначала только чанкинг: эмбеддинги нужны лишь измененным чанкам
+            nodes = await asyncio.to_thread(_get_splitter().get_nodes_from_documents, [llama_doc])
+            
+            # Векторы существующих чанков по хэшу содержимого
+            existing_vectors: Dict[str, List[str]] = {}
+            stale_vector_ids = []
+            existing_chunks = await asyncio.to_thread(
+                lambda: self.db.query(
+                    DocumentChunk.vector_id,
+                    DocumentChunk.content_hash
+                ).filter(DocumentChunk.document_id == document_id).all()
             )
+            for vector_id, content_hash in existing_chunks:
+                if content_hash:
+                    existing_vectors.setdefault(content_hash, []).append(vector_id)
+                else:
+                    stale_vector_ids.append(vector_id)
+            
+            chunk_rows = []
+            changed_nodes = []
+            for i, node in enumerate(nodes):
+                content_hash = self._chunk_hash(node)
+                reusable = existing_vectors.get(content_hash)
+                if reusable:
+                    # Чанк не изменился: переиспользуем вектор в Qdrant
+                    vector_id = reusable.pop()
+                else:
+                    vector_id = node.node_id
+                    changed_nodes.append(node)
+                
+                chunk_rows.append({
+                    "document_id": document.id,
+                    "chunk_index": i,
+                    "content": node.text,
+                    "vector_id": vector_id,
+                    "content_hash": content_hash,
+                    "metadata_json": {"document_id": document.id, "chunk_index": i},
+                })
             
-            # Обработка документа
-            nodes = pipeline.run(documents=[llama_doc])
+            # Векторы удаленных и измененных чанков
+            for vector_ids in existing_vectors.values():
+                stale_vector_ids.extend(vector_ids)
             
-            # Удаляем старые чанки из базы данных
-            self.db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document_id
-            ).delete()
+            vector_store = self._get_vector_store_lazy()
             
-            # Создаем новые чанки
-            for i, node in enumerate(nodes):
-                chunk_metadata = {**metadata, "chunk_index": i}
-                chunk = DocumentChunk(
-                    document_id=document.id,
-                    chunk_index=i,
-                    content=node.text,
-                    vector_id=node.node_id,
-                    metadata_json=chunk_metadata
-                )
-                self.db.add(chunk)
+            # Эмбеддинги и запись в Qdrant только для измененных чанков
+            if changed_nodes:
+                await asyncio.to_thread(_get_embed_pipeline().run, nodes=changed_nodes)
             
-            # Обновляем количество чанков
-            document.chunks_count = len(nodes)
-            self.db.commit()
+            # namespace читаем до commit: после него атрибуты документа истекают
+            namespace = document.namespace
+            
+            def _replace_chunks() -> None:
+                # Удаляем старые чанки без синхронизации сессии
+                self.db.query(DocumentChunk).filter(
+                    DocumentChunk.document_id == document_id
+                ).delete(synchronize_session=False)
+                
+                # Создаем новые чанки одним multi-row INSERT
+                self.db.bulk_insert_mappings(DocumentChunk, chunk_rows)
+                
+                # Обновляем количество чанков
+                document.chunks_count = len(nodes)
+                self.db.commit()
+            
+            await asyncio.to_thread(_replace_chunks)
             
             # Очищаем кэши для namespace
-            namespace = document.namespace
-            if namespace in self._indices:
-                del self._indices[namespace]
+            self._invalidate_namespace_cache(namespace)
             
-            keys_to_remove = [k for k in self._chat_engines.keys() if k.startswith(f"{namespace}:")]
-            for key in keys_to_remove:
-                del self._chat_engines[key]
+            # Устаревшие векторы удаляем после фиксации новых чанков
+            if stale_vector_ids:
+                await asyncio.to_thread(vector_store.delete_nodes, node_ids=stale_vector_ids)
             
-            logger.info(f"✅ Документ {document_id} переиндексирован, создано {len(nodes)} чанков")
+            logger.info(
+                f"✅ Документ {document_id} переиндексирован: {len(nodes)} чанков, "
+                f"эмбеддингов пересчитано {len(changed_nodes)}, удалено векторов {len(stale_vector_ids)}"
+            )
             
             return {
                 "success": True,
                 "document_id": document_id,
                 "chunks_created": len(nodes),
+                "chunks_embedded": len(changed_nodes),
                 "message": "Документ успешно переиндексирован"
             }
             
         except Exception as e:
             logger.error(f"❌ Ошибка переиндексации документа {document_id}: {e}")
-            self.db.rollback()
+            await asyncio.to_thread(self.db.rollback)
             return {
                 "success": False,
                 "error": str(e)
@@ -533,14 +993,19 @@ class LlamaIndexService:
     async def reindex_documents_batch(self, document_ids: List[int]) -> Dict[str, Any]:
         """Переиндексация группы документов."""
         try:
-            results = []
-            success_count = 0
+            # Документы переиндексируются параллельно, но не более
+            # reindex_concurrency одновременно (ограничение Azure OpenAI).
+            # У каждой задачи своя сессия: rollback одной не затрагивает
+            # объекты, с которыми работают остальные
+            semaphore = asyncio.Semaphore(settings.reindex_concurrency)
+            
+            async def _reindex(doc_id: int) -> Dict[str, Any]:
+                async with semaphore:
+                    with SessionLocal() as db:
+                        return await LlamaIndexService(db).reindex_document(doc_id)
             
-            for doc_id in document_ids:
-                result = await self.reindex_document(doc_id)
-                results.append(result)
-                if result["success"]:
-                    success_count += 1
+            results = await asyncio.gather(*[_reindex(doc_id) for doc_id in document_ids])
+            success_count = sum(1 for result in results if result["success"])
             
             return {
                 "message": f"Переиндексация завершена",
@@ -565,13 +1030,22 @@ class LlamaIndexService:
             if not document:
                 return {"error": "Документ не найден"}
             
-            # Получаем чанки
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document_id
-            ).order_by(DocumentChunk.chunk_index).all()
+            # Получаем чанки (только отдаваемые колонки, без ORM объектов)
+            chunks = self.db.execute(
+                select(
+                    DocumentChunk.chunk_index,
+                    DocumentChunk.content,
+                    DocumentChunk.vector_id,
+                    DocumentChunk.metadata_json
+                ).where(
+                    DocumentChunk.document_id == document_id
+                ).order_by(DocumentChunk.chunk_index)
+            ).all()
             
-            # Собираем полный текст
-            full_text = "\n".join([chunk.content for chunk in chunks])
+            # Полный текст хранится в документе (старые документы — из чанков)
+            full_text = document.full_text
+            if full_text is None:
+                full_text = "\n".join([chunk.content for chunk in chunks])
             
             return {
                 "document": {
@@ -599,24 +1073,29 @@ class LlamaIndexService:
             logger.error(f"❌ Ошибка получения содержимого документа {document_id}: {e}")
             return {"error": str(e)}
 
+    def iter_document_chunks(self, document_id: int) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковая выдача чанков документа.
+        Строки читаются с сервера пачками по 500, память не зависит от размера документа.
+        """
+        chunks = self.db.query(DocumentChunk).filter(
+            DocumentChunk.document_id == document_id
+        ).order_by(DocumentChunk.chunk_index).yield_per(500)
+        
+        for chunk in chunks:
+            yield {
+                "id": chunk.id,
+                "chunk_index": chunk.chunk_index,
+                "content": chunk.content,
+                "vector_id": chunk.vector_id,
+                "metadata": chunk.metadata_json or {},
+                "created_at": chunk.created_at.isoformat()
+            }
+
     async def get_document_chunks(self, document_id: int) -> List[Dict[str, Any]]:
         """Получить все чанки документа с метаданными."""
         try:
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document_id
-            ).order_by(DocumentChunk.chunk_index).all()
-            
-            return [
-                {
-                    "id": chunk.id,
-                    "chunk_index": chunk.chunk_index,
-                    "content": chunk.content,
-                    "vector_id": chunk.vector_id,
-                    "metadata": chunk.metadata_json or {},
-                    "created_at": chunk.created_at.isoformat()
-                }
-                for chunk in chunks
-            ]
+            return list(self.iter_document_chunks(document_id))
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения чанков документа {document_id}: {e}")
@@ -628,30 +1107,38 @@ class LlamaIndexService:
             # Информация о Qdrant
             qdrant_info = self._get_collection_info()
             
-            # Информация о документах в PostgreSQL
-            total_documents = self.db.query(DBDocument).filter(DBDocument.is_active == True).count()
-            total_chunks = self.db.query(DocumentChunk).count()
-            
-            # Информация по namespace
-            from sqlalchemy import func
-            namespace_stats = self.db.query(
+            # Статистика PostgreSQL одним запросом: строки по namespace и
+            # итоговая строка ROLLUP (namespace IS NULL); чанки считаются по
+            # кэшированному chunks_count вместо COUNT по document_chunks
+            rows = self.db.query(
                 DBDocument.namespace,
-                func.count(DBDocument.id).label("document_count")
-            ).filter(DBDocument.is_active == True).group_by(DBDocument.namespace).all()
+                func.count(DBDocument.id).label("document_count"),
+                func.coalesce(func.sum(DBDocument.chunks_count), 0).label("chunks_count")
+            ).filter(DBDocument.is_active == True).group_by(
+                func.rollup(DBDocument.namespace)
+            ).all()
+            
+            total_documents = 0
+            total_chunks = 0
+            namespace_stats = []
+            for row in rows:
+                if row.namespace is None:
+                    total_documents = row.document_count
+                    total_chunks = row.chunks_count
+                else:
+                    namespace_stats.append({"namespace": row.namespace, "documents": row.document_count})
             
             return {
                 "qdrant": qdrant_info,
                 "postgresql": {
                     "total_documents": total_documents,
                     "total_chunks": total_chunks,
-                    "namespace_stats": [
-                        {"namespace": ns, "documents": count}
-                        for ns, count in namespace_stats
-                    ]
+                    "namespace_stats": namespace_stats
                 },
                 "cache": {
                     "indices_cached": len(self._indices),
-                    "chat_engines_cached": len(self._chat_engines)
+                    "chat_engines_cached": sum(len(engines) for engines in self._chat_engines.values()),
+                    "semantic_cache_entries": len(_semantic_cache) if _semantic_cache is not None else 0
                 }
             }
             
@@ -671,41 +1158,100 @@ class LlamaIndexService:
         try:
             chat_engine = self._get_chat_engine(namespace, session_id)
             
-            # Получение ответа через встроенный chat engine
-            response = chat_engine.chat(message)
+            # Получение ответа через встроенный chat engine: синхронный
+            # поиск в Qdrant и вызов LLM выполняем вне event loop
+            response = await asyncio.to_thread(chat_engine.chat, message)
             
-            # Извлечение источников
-            sources = []
-            if hasattr(response, 'source_nodes') and response.source_nodes:
-                for node in response.source_nodes:
-                    if hasattr(node, 'metadata'):
-                        sources.append({
-                            "document_title": node.metadata.get("title", "Unknown"),
-                            "source_type": node.metadata.get("source_type", "unknown"),
-                            "score": getattr(node, 'score', 0.0)
-                        })
+            result = {
+                "response": str(response),
+                "sources": self._build_chat_sources(response),
+                "session_id": session_id
+            }
             
             # Сохранение в историю чатов
-            chat_record = ChatHistory(
-                session_id=session_id or "default",
-                namespace=namespace,
-                user_message=message,
-                assistant_message=str(response),
-                sources_used=sources
-            )
+            await self._save_chat_history(session_id or "default", namespace, message, result)
             
-            self.db.add(chat_record)
-            self.db.commit()
+            return result
             
-            return {
-                "response": str(response),
-                "sources": sources,
+        except Exception as e:
+            logger.error(f"Ошибка чата: {e}")
+            raise
+
+    async def chat_stream(
+        self,
+        message: str,
+        namespace: str = "default",
+        session_id: Optional[str] = None
+    ) -> AsyncGenerator[ServerSentEvent, None]:
+        """
+        Потоковый чат: токены ответа отдаются по мере генерации LLM.
+        История сохраняется после завершения потока.
+        """
+        try:
+            chat_engine = self._get_chat_engine(namespace, session_id)
+            
+            # Поиск контекста и старт генерации блокирующие — выполняем в потоке,
+            # затем по одному токену читаем синхронный генератор ответа
+            response = await asyncio.to_thread(chat_engine.stream_chat, message)
+            tokens = []
+            while True:
+                token = await asyncio.to_thread(next, response.response_gen, None)
+                if token is None:
+                    break
+                tokens.append(token)
+                yield ServerSentEvent(data=json.dumps({"type": "token", "content": token}))
+            
+            result = {
+                "response": "".join(tokens),
+                "sources": self._build_chat_sources(response),
                 "session_id": session_id
             }
             
+            await self._save_chat_history(session_id or "default", namespace, message, result)
+            
+            yield ServerSentEvent(data=json.dumps({
+                "type": "chat_complete",
+                "sources": result["sources"],
+                "session_id": session_id
+            }))
+            
         except Exception as e:
-            logger.error(f"Ошибка чата: {e}")
-            raise
+            logger.error(f"Ошибка потокового чата: {e}")
+            yield ServerSentEvent(data=json.dumps({"type": "error", "message": str(e)}))
+
+    def _build_chat_sources(self, response: Any) -> List[Dict[str, Any]]:
+        """Источники ответа чата (title/source_type берем из документов в БД)."""
+        sources = []
+        if hasattr(response, 'source_nodes') and response.source_nodes:
+            documents = self._get_source_documents(response.source_nodes)
+            for node in response.source_nodes:
+                if hasattr(node, 'metadata'):
+                    document = documents.get(node.metadata.get("document_id"))
+                    sources.append({
+                        "document_title": document.title if document else node.metadata.get("title", "Unknown"),
+                        "source_type": document.source_type if document else node.metadata.get("source_type", "unknown"),
+                        "score": getattr(node, 'score', 0.0)
+                    })
+        return sources
+
+    async def _save_chat_history(
+        self,
+        session_id: str,
+        namespace: str,
+        message: str,
+        result: Dict[str, Any]
+    ) -> None:
+        """Сохранение обмена сообщениями в историю чатов."""
+        chat_record = ChatHistory(
+            session_id=session_id,
+            namespace=namespace,
+            user_message=message,
+            assistant_message=result["response"],
+            sources_used=result["sources"]
+        )
+        
+        self.db.add(chat_record)
+        await asyncio.to_thread(self.db.commit)
 
     async def query(
         self, 
@@ -718,135 +1264,382 @@ class LlamaIndexService:
         try:
             start_time = time.time()
             
-            # Получить информацию о коллекции
-            collection_info = self._get_collection_info()
+            cached, query_embedding = await self._get_cached_response(namespace, question)
+            if cached is not None:
+                search_time = round((time.time() - start_time) * 1000, 2)
+                logger.info(f"✅ Query обслужен из семантического кэша за {search_time} мс")
+                return {
+                    **cached,
+                    "debug_info": {**cached["debug_info"], "cache_hit": True, "search_time_ms": search_time},
+                    "search_time_ms": search_time
+                }
+            
+            # Количество точек коллекции (легкий приблизительный count)
+            points_count = await self._aget_collection_points_count()
             
             index = self._get_index(namespace)
             
-            # Настройка постпроцессоров для фильтрации релевантности
-            node_postprocessors = [
-                SimilarityPostprocessor(similarity_cutoff=0.75)  # Фильтр релевантности
-            ]
+            # Настройка отбора кандидатов и постпроцессоров релевантности
+            similarity_top_k, node_postprocessors = self._get_retrieval_config()
             
             # Создание query engine с фильтрацией
             query_engine = index.as_query_engine(
-                similarity_top_k=10,  # Увеличиваем до фильтрации
+                similarity_top_k=similarity_top_k,
                 node_postprocessors=node_postprocessors,
+                vector_store_kwargs={"qdrant_filters": self._namespace_filter(namespace)},
+                use_async=True,
                 verbose=True
             )
             
-            # Выполнение запроса
-            response = query_engine.query(question)
+            # Эмбеддинг вопроса передаем готовым: он уже посчитан для
+            # семантического кэша или берется из LRU, повторно API не вызывается
+            if query_embedding is None:
+                query_embedding = await self._aget_query_embedding(question)
+            
+            # Асинхронный поиск (AsyncQdrantClient) и LLM: параллельные запросы
+            # не занимают пул потоков и выполняются конкурентно
+            response = await query_engine.aquery(
+                QueryBundle(query_str=question, embedding=query_embedding)
+            )
             
             search_time = (time.time() - start_time) * 1000
             
-            # Извлечение источников с улучшенной информацией
-            sources = []
-            if hasattr(response, 'source_nodes') and response.source_nodes:
-                for node in response.source_nodes:
-                    if hasattr(node, 'metadata'):
-                        sources.append({
-                            "document_title": node.metadata.get("title", "Unknown"),
-                            "source_type": node.metadata.get("source_type", "unknown"),
-                            "score": round(getattr(node, 'score', 0.0), 3),  # Округляем для читаемости
-                            "document_id": node.metadata.get("document_id"),
-                            "chunk_index": node.metadata.get("chunk_index", 0),
-                            "content_preview": node.text[:200] + "..." if len(node.text) > 200 else node.text
-                        })
-            
-            logger.info(f"✅ Query выполнен, найдено {len(sources)} релевантных источников (>0.75)")
+            # Узлы ниже порога релевантности уже отброшены постпроцессорами query engine
+            sources = self._build_query_sources(getattr(response, 'source_nodes', None) or [])
             
-            return {
+            similarity_cutoff = node_postprocessors[0].similarity_cutoff
+            logger.info(f"✅ Query выполнен, найдено {len(sources)} релевантных источников (>{similarity_cutoff})")
+            
+            result = {
                 "response": str(response),
                 "sources": sources,
                 "debug_info": {
-                    "collection_points_count": collection_info.get("points_count", 0),
-                    "similarity_cutoff": 0.75,
+                    "collection_points_count": points_count,
+                    "similarity_cutoff": similarity_cutoff,
                     "search_time_ms": round(search_time, 2),
                     "namespace": namespace,
-                    "sources_found": len(sources)
+                    "sources_found": len(sources),
+                    "cache_hit": False
                 },
-                "total_documents": collection_info.get("points_count", 0),
+                "total_documents": points_count,
                 "search_time_ms": round(search_time, 2)
             }
             
+            if _semantic_cache is not None:
+                _semantic_cache.put(namespace, question, query_embedding, result)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"❌ Ошибка запроса: {e}")
             raise
 
+    def _build_query_sources(self, source_nodes: List[Any]) -> List[Dict[str, Any]]:
+        """Источники ответа query с данными документов из БД (один запрос на все узлы)."""
+        source_nodes = [node for node in source_nodes if hasattr(node, 'metadata')]
+        documents = self._get_source_documents(source_nodes)
+        sources = []
+        for node in source_nodes:
+            document = documents.get(node.metadata.get("document_id"))
+            text = node.text
+            sources.append({
+                "document_title": document.title if document else node.metadata.get("title", "Unknown"),
+                "source_type": document.source_type if document else node.metadata.get("source_type", "unknown"),
+                "score": round(getattr(node, 'score', None) or 0.0, 3),  # Округляем для читаемости
+                "document_id": node.metadata.get("document_id"),
+                "chunk_index": node.metadata.get("chunk_index", 0),
+                "content_preview": text[:200] + "..." if len(text) > 200 else text
+            })
+        return sources
+
+    async def query_batch(
+        self,
+        questions: List[str],
+        namespace: str = "default"
+    ) -> List[Dict[str, Any]]:
+        """
+        Несколько независимых запросов за один проход.
+        Эмбеддинги вопросов считаются одним запросом к API, поиск в Qdrant —
+        одним query_batch_points, а синтез ответов LLM идет параллельно.
+        Фильтр по namespace и семантический кэш — те же, что и в query.
+        """
+        try:
+            start_time = time.time()
+            results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+            embeddings: List[Optional[List[float]]] = [None] * len(questions)
+            
+            # Точные совпадения из семантического кэша — без эмбеддинга
+            if _semantic_cache is not None:
+                for i, question in enumerate(questions):
+                    results[i] = _semantic_cache.get_exact(namespace, question)
+            
+            # Эмбеддинги оставшихся вопросов: из LRU, недостающие — одним батчем
+            pending = [i for i, result in enumerate(results) if result is None]
+            embedding_model = settings.azure_openai_embedding_model
+            with _query_embeddings_lock:
+                for i in pending:
+                    embeddings[i] = _query_embeddings.get((embedding_model, questions[i]))
+            missing = [i for i in pending if embeddings[i] is None]
+            if missing:
+                computed = await self.embed_model.aget_text_embedding_batch(
+                    [questions[i] for i in missing]
+                )
+                with _query_embeddings_lock:
+                    for i, embedding in zip(missing, computed):
+                        embeddings[i] = embedding
+                        _query_embeddings[(embedding_model, questions[i])] = embedding
+                    while len(_query_embeddings) > settings.query_embedding_cache_size:
+                        _query_embeddings.popitem(last=False)
+            
+            # Похожие вопросы из семантического кэша
+            if _semantic_cache is not None:
+                for i in pending:
+                    results[i] = _semantic_cache.get_similar(namespace, embeddings[i])
+            
+            cache_hits = {i for i, result in enumerate(results) if result is not None}
+            pending = [i for i in pending if i not in cache_hits]
+            
+            if pending:
+                similarity_top_k, node_postprocessors = self._get_retrieval_config()
+                vector_store = self._get_vector_store_lazy()
+                namespace_filter = self._namespace_filter(namespace)
+                
+                # Один запрос к Qdrant на все вопросы без ответа в кэше
+                responses = await get_async_qdrant_client().query_batch_points(
+                    collection_name=settings.qdrant_collection_name,
+                    requests=[
+                        QueryRequest(
+                            query=embeddings[i],
+                            using=vector_store.dense_vector_name or None,
+                            filter=namespace_filter,
+                            limit=similarity_top_k,
+                            with_payload=True
+                        )
+                        for i in pending
+                    ]
+                )
+                
+                synthesizer = get_response_synthesizer(llm=self.llm, use_async=True)
+                
+                async def _answer(question: str, embedding: List[float], points: List[Any]) -> Dict[str, Any]:
+                    query_bundle = QueryBundle(query_str=question, embedding=embedding)
+                    result = vector_store.parse_to_query_result(points)
+                    nodes = [
+                        NodeWithScore(node=node, score=score)
+                        for node, score in zip(result.nodes, result.similarities)
+                    ]
+                    # Реранкер считает на CPU, поэтому постпроцессоры — в пуле потоков
+                    for postprocessor in node_postprocessors:
+                        nodes = await asyncio.to_thread(
+                            postprocessor.postprocess_nodes, nodes, query_bundle=query_bundle
+                        )
+                    response = await synthesizer.asynthesize(query_bundle, nodes)
+                    sources = self._build_query_sources(nodes)
+                    return {
+                        "response": str(response),
+                        "sources": sources,
+                        "debug_info": {
+                            "similarity_cutoff": node_postprocessors[0].similarity_cutoff,
+                            "namespace": namespace,
+                            "sources_found": len(sources),
+                            "cache_hit": False
+                        }
+                    }
+                
+                answers = await asyncio.gather(*[
+                    _answer(questions[i], embeddings[i], response.points)
+                    for i, response in zip(pending, responses)
+                ])
+                for i, answer in zip(pending, answers):
+                    results[i] = answer
+                    if _semantic_cache is not None:
+                        _semantic_cache.put(namespace, questions[i], embeddings[i], answer)
+            
+            search_time = round((time.time() - start_time) * 1000, 2)
+            for i, result in enumerate(results):
+                results[i] = {
+                    **result,
+                    "debug_info": {**result["debug_info"], "cache_hit": i in cache_hits, "search_time_ms": search_time},
+                    "search_time_ms": search_time
+                }
+            
+            logger.info(
+                f"✅ Пакетный query: {len(questions)} вопросов "
+                f"({len(cache_hits)} из семантического кэша) за {search_time} мс"
+            )
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного запроса: {e}")
+            raise
+
     async def get_documents(
         self, 
-        namespace: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
-        """Получение списка документов."""
+        namespace: Optional[str] = None,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        include_metadata: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Получение списка документов с keyset-пагинацией.
+        Без limit возвращаются все документы (next_cursor = None).
+        Метаданные и их размер выбираются только при include_metadata.
+        """
         try:
-            query = self.db.query(DBDocument).filter(DBDocument.is_active == True)
+            if limit is not None:
+                limit = max(1, min(limit, MAX_DOCUMENTS_PAGE_LIMIT))
+            
+            # Выбираем только нужные колонки: кортежи вместо ORM объектов
+            columns = [
+                DBDocument.id,
+                DBDocument.title,
+                DBDocument.source_type,
+                DBDocument.namespace,
+                DBDocument.created_at,
+                DBDocument.chunks_count,
+            ]
+            if include_metadata:
+                columns += [
+                    DBDocument.metadata_json,
+                    # Размер метаданных считает PostgreSQL, без сериализации в Python
+                    func.octet_length(cast(DBDocument.metadata_json, Text)).label("metadata_size"),
+                ]
+            
+            query = select(*columns).where(DBDocument.is_active.is_(True))
             
             if namespace:
-                query = query.filter(DBDocument.namespace == namespace)
+                query = query.where(DBDocument.namespace == namespace)
             
-            documents = query.order_by(DBDocument.created_at.desc()).all()
+            if before:
+                cursor_created_at, cursor_id = _decode_cursor(before)
+                query = query.where(
+                    tuple_(DBDocument.created_at, DBDocument.id) < (cursor_created_at, cursor_id)
+                )
             
-            return [
-                {
-                    "id": doc.id,
-                    "title": doc.title,
-                    "source_type": doc.source_type,
-                    "namespace": doc.namespace,
-                    "created_at": doc.created_at.isoformat(),
-                    "chunks_count": doc.chunks_count,
-                    "metadata": doc.metadata_json or {},
-                    "size": len(str(doc.metadata_json or {})),
+            query = query.order_by(
+                DBDocument.created_at.desc(),
+                DBDocument.id.desc()
+            )
+            if limit is not None:
+                query = query.limit(limit)
+            
+            rows = await asyncio.to_thread(lambda: self.db.execute(query).all())
+            
+            documents = []
+            for row in rows:
+                document = {
+                    "id": row.id,
+                    "title": row.title,
+                    "source_type": row.source_type,
+                    "namespace": row.namespace,
+                    "created_at": row.created_at.isoformat(),
+                    "chunks_count": row.chunks_count,
                 }
-                for doc in documents
-            ]
+                if include_metadata:
+                    document["metadata"] = row.metadata_json or {}
+                    document["size"] = row.metadata_size or 0
+                documents.append(document)
+            
+            next_cursor = None
+            if limit is not None and len(rows) == limit:
+                next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+            
+            return {"documents": documents, "next_cursor": next_cursor}
             
+        except ValueError:
+            raise
         except Exception as e:
             logger.warning(f"Ошибка получения документов: {e}")
             # Возвращаем пустой список при ошибке, а не поднимаем исключение
-            return []
+            return {"documents": [], "next_cursor": None}
 
     async def delete_document(self, document_id: int) -> bool:
         """Удаление документа."""
-        try:
-            document = self.db.query(DBDocument).filter(
-                DBDocument.id == document_id,
-                DBDocument.is_active == True
+        def _deactivate() -> Optional[str]:
+            # Мягкое удаление одним UPDATE ... RETURNING без загрузки документа
+            row = self.db.execute(
+                update(DBDocument).where(
+                    DBDocument.id == document_id,
+                    DBDocument.is_active.is_(True)
+                ).values(is_active=False).returning(DBDocument.namespace)
             ).first()
             
-            if not document:
-                return False
+            if not row:
+                self.db.rollback()
+                return None
             
-            # Мягкое удаление
-            document.is_active = False
             self.db.commit()
+            return row.namespace
+        
+        try:
+            # Запросы к БД синхронные — выполняем в пуле потоков
+            namespace = await asyncio.to_thread(_deactivate)
+            if namespace is None:
+                return False
             
             # Очистка кэшей
-            namespace = document.namespace
-            if namespace in self._indices:
-                del self._indices[namespace]
+            self._invalidate_namespace_cache(namespace)
             
-            keys_to_remove = [k for k in self._chat_engines.keys() if k.startswith(f"{namespace}:")]
-            for key in keys_to_remove:
-                del self._chat_engines[key]
+            await self._delete_document_vectors(document_id)
             
             logger.info(f"Документ {document_id} удален")
             return True
             
         except Exception as e:
             logger.error(f"Ошибка удаления документа: {e}")
-            self.db.rollback()
+            await asyncio.to_thread(self.db.rollback)
             raise
 
+    async def _delete_document_vectors(self, document_id: int) -> None:
+        """
+        Удаление векторов документа из Qdrant одним запросом.
+        Точки ищутся по ref_doc_id (поле doc_id в payload) и по vector_id
+        чанков — для документов, проиндексированных со случайным ref_doc_id.
+        """
+        vector_ids = await asyncio.to_thread(
+            lambda: self.db.execute(
+                select(DocumentChunk.vector_id).where(DocumentChunk.document_id == document_id)
+            ).scalars().all()
+        )
+        
+        conditions = [FieldCondition(key="doc_id", match=MatchValue(value=self._llama_doc_id(document_id)))]
+        if vector_ids:
+            conditions.append(HasIdCondition(has_id=list(vector_ids)))
+        
+        try:
+            # wait=False: Qdrant применяет удаление асинхронно, ответ не ждем
+            await asyncio.to_thread(
+                get_qdrant_client().delete,
+                collection_name=settings.qdrant_collection_name,
+                points_selector=Filter(should=conditions),
+                wait=False
+            )
+        except Exception as e:
+            # Документ уже скрыт в БД; оставшиеся векторы уберет переиндексация
+            logger.warning(f"⚠️ Не удалось удалить векторы документа {document_id} из Qdrant: {e}")
+
     async def get_chat_history(
         self,
         session_id: Optional[str] = None,
         namespace: Optional[str] = None,
-        limit: int = 50
-    ) -> List[Dict[str, Any]]:
-        """Получение истории чатов."""
+        limit: int = 50,
+        before: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Получение истории чатов с keyset-пагинацией.
+        before — курсор next_cursor предыдущей страницы.
+        """
         try:
-            query = self.db.query(ChatHistory)
+            limit = max(1, min(limit, MAX_CHAT_HISTORY_LIMIT))
+            
+            query = self.db.query(ChatHistory).with_entities(
+                ChatHistory.id,
+                ChatHistory.session_id,
+                ChatHistory.namespace,
+                ChatHistory.user_message,
+                ChatHistory.assistant_message,
+                ChatHistory.created_at,
+            )
             
             if session_id:
                 query = query.filter(ChatHistory.session_id == session_id)
@@ -854,21 +1647,39 @@ class LlamaIndexService:
             if namespace:
                 query = query.filter(ChatHistory.namespace == namespace)
             
-            history = query.order_by(
-                ChatHistory.created_at.desc()
-            ).limit(limit).all()
+            if before:
+                # Поиск по диапазону индекса вместо пропуска OFFSET строк
+                cursor_created_at, cursor_id = _decode_cursor(before)
+                query = query.filter(
+                    tuple_(ChatHistory.created_at, ChatHistory.id) < (cursor_created_at, cursor_id)
+                )
             
-            return [
-                {
-                    "id": record.id,
-                    "session_id": record.session_id,
-                    "namespace": record.namespace,
-                    "user_message": record.user_message,
-                    "assistant_message": record.assistant_message,
-                    "created_at": record.created_at.isoformat()
-                }
-                for record in history
-            ]
+            # Порядок совпадает с индексом idx_chat_session_namespace_created_id
+            history = await asyncio.to_thread(
+                query.order_by(
+                    ChatHistory.created_at.desc(),
+                    ChatHistory.id.desc()
+                ).limit(limit).all
+            )
+            
+            next_cursor = None
+            if len(history) == limit:
+                next_cursor = _encode_cursor(history[-1].created_at, history[-1].id)
+            
+            return {
+                "history": [
+                    {
+                        "id": record.id,
+                        "session_id": record.session_id,
+                        "namespace": record.namespace,
+                        "user_message": record.user_message,
+                        "assistant_message": record.assistant_message,
+                        "created_at": record.created_at.isoformat()
+                    }
+                    for record in history
+                ],
+                "next_cursor": next_cursor
+            }
             
         except Exception as e:
             logger.error(f"Ошибка получения истории: {e}")
@@ -878,12 +1689,7 @@ class LlamaIndexService:
         """Ресинхронизация документов в namespace."""
         try:
             # Очистка кэшей
-            if namespace in self._indices:
-                del self._indices[namespace]
-            
-            keys_to_remove = [k for k in self._chat_engines.keys() if k.startswith(f"{namespace}:")]
-            for key in keys_to_remove:
-                del self._chat_engines[key]
+            self._invalidate_namespace_cache(namespace)
             
             # Получение количества документов
             doc_count = self.db.query(DBDocument).filter(
@@ -903,45 +1709,84 @@ class LlamaIndexService:
             logger.error(f"Ошибка ресинхронизации: {e}")
             raise
 
-    def index_document(self, document: 'DBDocument') -> bool:
+    def _build_chunk_nodes(self, document: DBDocument, chunks: List[Any]) -> List[TextNode]:
+        """Узлы из сохраненных чанков документа (ID узла = vector_id чанка)."""
+        metadata = self._node_metadata(document)
+        source = RelatedNodeInfo(node_id=self._llama_doc_id(document.id))
+        return [
+            TextNode(
+                id_=chunk.vector_id,
+                text=chunk.content,
+                metadata={**metadata, "chunk_index": chunk.chunk_index},
+                excluded_embed_metadata_keys=NODE_METADATA_EXCLUDED_KEYS + ["chunk_index"],
+                excluded_llm_metadata_keys=NODE_METADATA_EXCLUDED_KEYS + ["chunk_index"],
+                relationships={NodeRelationship.SOURCE: source},
+            )
+            for chunk in chunks
+        ]
+
+    async def _aindex_nodes(self, nodes: List[TextNode]) -> Dict[int, Exception]:
+        """
+        Эмбеддинги и запись узлов в Qdrant пачками по index_batch_size.
+        Возвращает ошибки по document_id для пачек, которые не удалось записать.
+        """
+        vector_store = self._get_vector_store_lazy()
+        
+        # Пачки узлов: эмбеддинг и upsert одной пачки перекрываются
+        # с сетевыми задержками других, не более index_concurrency одновременно
+        semaphore = asyncio.Semaphore(settings.index_concurrency)
+        
+        async def _index_batch(batch: List[TextNode]) -> None:
+            async with semaphore:
+                embeddings = await self.embed_model.aget_text_embedding_batch(
+                    [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+                )
+                for node, embedding in zip(batch, embeddings):
+                    node.embedding = embedding
+                await vector_store.async_add(batch)
+        
+        batch_size = settings.index_batch_size
+        batches = [nodes[i:i + batch_size] for i in range(0, len(nodes), batch_size)]
+        results = await asyncio.gather(
+            *[_index_batch(batch) for batch in batches],
+            return_exceptions=True
+        )
+        
+        errors: Dict[int, Exception] = {}
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                for node in batch:
+                    errors.setdefault(node.metadata["document_id"], result)
+        return errors
+
+    async def aindex_document(self, document: 'DBDocument') -> bool:
         """
         Индексирует документ в векторном хранилище.
-        ИСПРАВЛЕНО: Теперь получает контент из chunks.
+        Чанки уже нарезаны и сохранены в БД: каждый становится узлом
+        с ID = vector_id чанка, без повторного чанкинга.
         """
         try:
-            # Получаем чанки документа
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.document_id == document.id
-            ).order_by(DocumentChunk.chunk_index).all()
+            # Только нужные колонки: кортежи без ORM объектов и identity map
+            chunks = self.db.execute(
+                select(
+                    DocumentChunk.vector_id,
+                    DocumentChunk.content,
+                    DocumentChunk.chunk_index
+                ).where(
+                    DocumentChunk.document_id == document.id
+                ).order_by(DocumentChunk.chunk_index)
+            ).all()
             
             if not chunks:
                 logger.warning(f"Не найдены чанки для документа {document.id}")
                 return False
             
-            # Собираем полный текст из чанков
-            full_text = "\n".join([chunk.content for chunk in chunks])
-            
-            # Создаем документ LlamaIndex
-            llama_doc = Document(
-                text=full_text,
-                metadata={
-                    "title": document.title,
-                    "source_type": document.source_type,
-                    "namespace": document.namespace,
-                    "document_id": document.id,
-                    "vector_id": document.vector_id,
-                }
-            )
-            
-            # Получаем индекс для namespace
-            index = self._get_index(document.namespace)
-            
-            # Добавляем документ в индекс
-            index.insert(llama_doc)
+            errors = await self._aindex_nodes(self._build_chunk_nodes(document, chunks))
+            if errors:
+                raise errors[document.id]
             
             # Очищаем кэш для namespace
-            if document.namespace in self._chat_engines:
-                del self._chat_engines[document.namespace]
+            self._invalidate_namespace_cache(document.namespace)
             
             logger.info(f"Документ {document.id} успешно проиндексирован в namespace {document.namespace}")
             return True
@@ -961,26 +1806,19 @@ class LlamaIndexService:
             # Получаем ответ через встроенный chat engine
             response = chat_engine.chat(message)
             
-            # Извлечение источников
-            sources = []
-            if hasattr(response, 'source_nodes') and response.source_nodes:
-                for node in response.source_nodes:
-                    if hasattr(node, 'metadata'):
-                        sources.append({
-                            "document_title": node.metadata.get("title", "Unknown"),
-                            "source_type": node.metadata.get("source_type", "unknown"),
-                            "score": getattr(node, 'score', 0.0)
-                        })
-            
-            # Формируем ответ с источниками
+            # Формируем ответ с источниками одной склейкой строк
             result = str(response)
             
-            if sources:
-                result += "\n\n📚 **Источники:**\n"
-                for i, source in enumerate(sources, 1):
-                    title = source.get('document_title', 'Неизвестный документ')
-                    score = source.get('score', 0.0)
-                    result += f"{i}. {title} (релевантность: {score:.3f})\n"
+            source_nodes = [
+                node for node in getattr(response, 'source_nodes', None) or []
+                if hasattr(node, 'metadata')
+            ]
+            if source_nodes:
+                result += "\n\n📚 **Источники:**\n" + "".join(
+                    f"{i}. {node.metadata.get('title', 'Неизвестный документ')} "
+                    f"(релевантность: {getattr(node, 'score', None) or 0.0:.3f})\n"
+                    for i, node in enumerate(source_nodes, 1)
+                )
             
             logger.info(f"Получен ответ на запрос в namespace {namespace}")
             return result
@@ -0,0 +1,137 @@
+"""
+Семантический кэш ответов для query.
+Повторные и почти одинаковые вопросы обслуживаются из памяти без LLM.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (namespace, текст вопроса)
+CacheKey = Tuple[str, str]
+
+
+class SemanticCache:
+    """
+    LRU кэш ответов с поиском по косинусной близости эмбеддингов вопросов.
+
+    Векторы лежат в заранее выделенной матрице (max_size x размерность):
+    поиск — одно матричное умножение по маске namespace и TTL, без сборки
+    матрицы на каждый запрос.
+    """
+
+    def __init__(self, max_size: int, threshold: float, ttl_seconds: int):
+        """Инициализация кэша."""
+        self._max_size = max_size
+        self._threshold = threshold
+        self._ttl_seconds = ttl_seconds
+        # ключ -> (номер строки матрицы, ответ); порядок — LRU
+        self._entries: "OrderedDict[CacheKey, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        # Матрица создается при первой записи, когда известна размерность
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[CacheKey]] = [None] * max_size
+        self._slot_namespaces = np.full(max_size, -1, dtype=np.int32)
+        self._slot_created = np.zeros(max_size, dtype=np.float64)
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._namespace_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_exact(self, namespace: str, question: str) -> Optional[Dict[str, Any]]:
+        """Точное совпадение по тексту вопроса — без вычисления эмбеддинга."""
+        key = (namespace, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - self._slot_created[entry[0]] > self._ttl_seconds:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def get_similar(self, namespace: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Ближайший ответ в namespace, если его сходство не ниже порога."""
+        query_vector = self._normalize(embedding)
+
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None or self._vectors is None:
+                return None
+
+            valid = (self._slot_namespaces == namespace_id) & (
+                time.monotonic() - self._slot_created <= self._ttl_seconds
+            )
+            if not valid.any():
+                return None
+
+            # Векторы нормализованы при записи, поэтому косинус = скалярное произведение
+            similarities = np.where(valid, self._vectors @ query_vector, -np.inf)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self._threshold:
+                return None
+
+            key = self._slot_keys[best]
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+    def put(
+        self,
+        namespace: str,
+        question: str,
+        embedding: List[float],
+        response: Dict[str, Any]
+    ) -> None:
+        """Сохранение ответа с вытеснением давно не использованных записей."""
+        if self._max_size <= 0:
+            return
+
+        key = (namespace, question)
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self._max_size, vector.shape[0]), dtype=np.float32)
+
+            if key in self._entries:
+                slot = self._entries[key][0]
+            else:
+                if not self._free_slots:
+                    self._remove(next(iter(self._entries)))
+                slot = self._free_slots.pop()
+
+            self._vectors[slot] = vector
+            self._slot_keys[slot] = key
+            self._slot_namespaces[slot] = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+            self._slot_created[slot] = time.monotonic()
+            self._entries[key] = (slot, response)
+            self._entries.move_to_end(key)
+
+    def invalidate_namespace(self, namespace: str) -> None:
+        """Сброс всех ответов namespace (после изменения документов)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == namespace]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Полная очистка кэша."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: CacheKey) -> None:
+        """Удаление записи и освобождение ее строки матрицы (под блокировкой)."""
+        slot, _ = self._entries.pop(key)
+        self._slot_keys[slot] = None
+        self._slot_namespaces[slot] = -1
+        self._free_slots.append(slot)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -9,6 +9,9 @@ from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Недопустимые символы имени файла заменяются на "_" за один проход
+INVALID_FILENAME_CHARS = str.maketrans({char: "_" for char in '<>:"/\\|?*'})
+
 
 def extract_text_from_file(file_path: str) -> Optional[str]:
     """
@@ -50,9 +53,7 @@ def sanitize_filename(filename: str) -> str:
         Очищенное имя файла
     """
     # Удаляем недопустимые символы для имени файла
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
+    filename = filename.translate(INVALID_FILENAME_CHARS)
     
     # Ограничиваем длину имени файла
     if len(filename) > 255:
@@ -2,14 +2,23 @@
 Модуль для извлечения текста из файлов различных форматов.
 """
 
+import asyncio
 import io
 import re
 from typing import Union
 from pathlib import Path
 from fastapi import UploadFile
-import docx
-import markdown
-from bs4 import BeautifulSoup
+from charset_normalizer import from_bytes
+
+from ..config import settings
+from .file_utils import INVALID_FILENAME_CHARS
+
+# Пробелы вокруг переносов строк и пустые строки
+LINE_BREAKS_RE = re.compile(r"\s*\n\s*")
+# Перенос после строки без завершающей пунктуации и следующий символ
+CONTINUATION_RE = re.compile(r"(?<![.!?])\n(.)")
+# Размер блока при чтении загружаемого файла
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024
 
 
 async def extract_text_from_file(file: UploadFile) -> str:
@@ -23,9 +32,16 @@ async def extract_text_from_file(file: UploadFile) -> str:
         str: Извлеченный текст
         
     Raises:
-        ValueError: Если формат файла не поддерживается
+        ValueError: Если формат файла не поддерживается или файл слишком большой
     """
-    content = await file.read()
+    # Читаем блоками и прерываемся, как только превышен лимит размера
+    max_bytes = settings.max_file_size_mb * 1024 * 1024
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_READ_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise ValueError(f"Файл слишком большой (максимум {settings.max_file_size_mb}MB)")
+    content = bytes(buffer)
     filename = file.filename or ""
     content_type = file.content_type or ""
     
@@ -34,59 +50,70 @@ async def extract_text_from_file(file: UploadFile) -> str:
     
     file_extension = Path(filename).suffix.lower()
     
+    # Разбор выполняется в пуле потоков, чтобы не блокировать event loop
+    
     # PDF файлы - отключаем обработку
     if file_extension == ".pdf" or "pdf" in content_type:
         raise ValueError("Обработка PDF файлов временно отключена")
     
     # Word документы
     elif file_extension in [".docx", ".doc"] or "document" in content_type:
-        return extract_text_from_docx(content)
+        return await asyncio.to_thread(extract_text_from_docx, content)
     
     # Markdown файлы
     elif file_extension in [".md", ".markdown"]:
-        return extract_text_from_markdown(content)
+        return await asyncio.to_thread(extract_text_from_markdown, content)
     
     # HTML файлы
     elif file_extension in [".html", ".htm"] or "html" in content_type:
-        return extract_text_from_html(content)
+        return await asyncio.to_thread(extract_text_from_html, content)
     
     # Текстовые файлы (по умолчанию)
     elif file_extension in [".txt", ".text"] or "text" in content_type or not file_extension:
-        try:
-            return content.decode("utf-8")
-        except UnicodeDecodeError:
-            # Попытка с другой кодировкой
-            try:
-                return content.decode("cp1251")
-            except UnicodeDecodeError:
-                return content.decode("latin-1")
+        return await asyncio.to_thread(decode_text, content)
     
     else:
         raise ValueError(f"Неподдерживаемый тип файла: {file_extension} ({content_type})")
 
 
+def decode_text(content: bytes) -> str:
+    """
+    Декодирует текстовый файл.
+    UTF-8 проверяется одним проходом, иначе кодировка определяется один раз
+    через charset-normalizer вместо перебора кодировок.
+    """
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        best = from_bytes(content).best()
+        if best is not None:
+            return str(best)
+        return content.decode("utf-8", errors="replace")
+
+
 def extract_text_from_docx(content: bytes) -> str:
     """Извлекает текст из Word документа (.docx)."""
+    # Тяжелые парсеры импортируются при первом использовании, а не при старте
+    import docx
+    
     try:
         doc = docx.Document(io.BytesIO(content))
-        text = ""
-        
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        
-        return text.strip()
+        return "\n".join(paragraph.text for paragraph in doc.paragraphs).strip()
     except Exception as e:
         raise ValueError(f"Ошибка обработки DOCX: {e}")
 
 
 def extract_text_from_markdown(content: bytes) -> str:
     """Извлекает текст из Markdown файла."""
+    import markdown
+    from bs4 import BeautifulSoup
+    
     try:
         md_text = content.decode("utf-8")
         
         # Конвертируем Markdown в HTML, затем извлекаем текст
         html = markdown.markdown(md_text)
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
         
         return soup.get_text(separator="\n").strip()
     except Exception as e:
@@ -95,9 +122,11 @@ def extract_text_from_markdown(content: bytes) -> str:
 
 def extract_text_from_html(content: bytes) -> str:
     """Извлекает текст из HTML файла."""
+    from bs4 import BeautifulSoup
+    
     try:
         html_text = content.decode("utf-8")
-        soup = BeautifulSoup(html_text, "html.parser")
+        soup = BeautifulSoup(html_text, "lxml")  # C-парсер libxml2
         
         # Удаляем скрипты и стили
         for script in soup(["script", "style"]):
@@ -119,18 +148,17 @@ def clean_text(text: str) -> str:
         str: Очищенный текст
     """
     # Удаление лишних пробелов и переносов строк
-    lines = [line.strip() for line in text.split("\n") if line.strip()]
-    
-    # Объединение строк с учетом пунктуации
-    cleaned_lines = []
-    for line in lines:
-        if cleaned_lines and not line[0].isupper() and not cleaned_lines[-1].endswith((".", "!", "?")):
-            # Продолжение предыдущей строки
-            cleaned_lines[-1] += " " + line
-        else:
-            cleaned_lines.append(line)
+    text = LINE_BREAKS_RE.sub("\n", text.strip())
     
-    return "\n".join(cleaned_lines)
+    # Объединение строк с учетом пунктуации: строка без точки в конце
+    # продолжается следующей, если та начинается не с заглавной буквы
+    return CONTINUATION_RE.sub(_join_continuation, text)
+
+
+def _join_continuation(match: re.Match) -> str:
+    """Перенос перед заглавной буквой сохраняется, иначе заменяется пробелом."""
+    first_char = match.group(1)
+    return ("\n" if first_char.isupper() else " ") + first_char
 
 
 def sanitize_filename(filename: str) -> str:
@@ -146,7 +174,7 @@ def sanitize_filename(filename: str) -> str:
     # Удаляем путь, оставляем только имя файла
     filename = Path(filename).name
     # Заменяем недопустимые символы
-    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    filename = filename.translate(INVALID_FILENAME_CHARS)
     # Ограничиваем длину
     if len(filename) > 255:
         name, ext = Path(filename).stem, Path(filename).suffix
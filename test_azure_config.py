@@ -4,18 +4,22 @@
 Проверяет подтягивание параметров из .env и возможность подключения.
 """
 
+import logging
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 import asyncio
+import httpx
 from openai import AsyncAzureOpenAI
 import sys
 
+log = logging.getLogger("azure_config_check")
+
 def load_env_config():
     """Загружает конфигурацию из .env файла."""
     env_path = Path('.env')
     if not env_path.exists():
-        print("❌ Файл .env не найден!")
+        log.error("❌ Файл .env не найден!")
         return None
     
     load_dotenv(env_path)
@@ -30,15 +34,14 @@ def load_env_config():
     
     return config
 
-def print_config(config):
+def log_config(config):
     """Выводит конфигурацию (без API ключа)."""
-    print("🔧 Конфигурация Azure OpenAI:")
-    print(f"   Endpoint: {config['endpoint']}")
-    print(f"   API Version: {config['api_version']}")
-    print(f"   Chat Deployment: {config['chat_deployment']}")
-    print(f"   Embedding Deployment: {config['embedding_deployment']}")
-    print(f"   API Key: {'✅ Установлен' if config['api_key'] else '❌ Не установлен'}")
-    print()
+    log.info("🔧 Конфигурация Azure OpenAI:")
+    log.info(f"   Endpoint: {config['endpoint']}")
+    log.info(f"   API Version: {config['api_version']}")
+    log.info(f"   Chat Deployment: {config['chat_deployment']}")
+    log.info(f"   Embedding Deployment: {config['embedding_deployment']}")
+    log.info(f"   API Key: {'✅ Установлен' if config['api_key'] else '❌ Не установлен'}")
 
 def validate_config(config):
     """Проверяет обязательные параметры."""
@@ -46,48 +49,36 @@ def validate_config(config):
     missing = [field for field in required_fields if not config.get(field)]
     
     if missing:
-        print(f"❌ Отсутствуют обязательные параметры: {', '.join(missing)}")
+        log.error(f"❌ Отсутствуют обязательные параметры: {', '.join(missing)}")
         return False
     
-    print("✅ Все обязательные параметры присутствуют")
+    log.info("✅ Все обязательные параметры присутствуют")
     return True
 
-async def test_embedding_deployment(config):
+async def test_embedding_deployment(config, client):
     """Тестирует embedding deployment."""
-    print("🧪 Тестирую embedding deployment...")
+    log.info("🧪 Тестирую embedding deployment...")
     
     try:
-        client = AsyncAzureOpenAI(
-            api_key=config['api_key'],
-            api_version=config['api_version'],
-            azure_endpoint=config['endpoint']
-        )
-        
         # Простой тест с минимальным текстом
         response = await client.embeddings.create(
             model=config['embedding_deployment'],
             input="test"
         )
         
-        print(f"✅ Embedding deployment '{config['embedding_deployment']}' работает!")
-        print(f"   Размерность вектора: {len(response.data[0].embedding)}")
+        log.info(f"✅ Embedding deployment '{config['embedding_deployment']}' работает!")
+        log.info(f"   Размерность вектора: {len(response.data[0].embedding)}")
         return True
         
     except Exception as e:
-        print(f"❌ Ошибка embedding deployment: {e}")
+        log.error(f"❌ Ошибка embedding deployment: {e}")
         return False
 
-async def test_chat_deployment(config):
+async def test_chat_deployment(config, client):
     """Тестирует chat deployment."""
-    print("🧪 Тестирую chat deployment...")
+    log.info("🧪 Тестирую chat deployment...")
     
     try:
-        client = AsyncAzureOpenAI(
-            api_key=config['api_key'],
-            api_version=config['api_version'],
-            azure_endpoint=config['endpoint']
-        )
-        
         # Простой тест чата
         response = await client.chat.completions.create(
             model=config['chat_deployment'],
@@ -95,21 +86,19 @@ async def test_chat_deployment(config):
             max_tokens=50
         )
         
-        print(f"✅ Chat deployment '{config['chat_deployment']}' работает!")
-        print(f"   Ответ: {response.choices[0].message.content}")
+        log.info(f"✅ Chat deployment '{config['chat_deployment']}' работает!")
+        log.info(f"   Ответ: {response.choices[0].message.content}")
         return True
         
     except Exception as e:
-        print(f"❌ Ошибка chat deployment: {e}")
+        log.error(f"❌ Ошибка chat deployment: {e}")
         return False
 
-async def list_deployments(config):
+async def list_deployments(config, http_client):
     """Пытается получить список доступных deployments."""
-    print("📋 Пытаюсь получить список deployments...")
+    log.info("📋 Пытаюсь получить список deployments...")
     
     try:
-        import httpx
-        
         headers = {
             'api-key': config['api_key'],
             'Content-Type': 'application/json'
@@ -118,28 +107,27 @@ async def list_deployments(config):
         # Формируем URL для получения списка deployments
         url = f"{config['endpoint'].rstrip('/')}/openai/deployments?api-version={config['api_version']}"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                deployments = response.json()
-                print("✅ Доступные deployments:")
-                for deployment in deployments.get('data', []):
-                    print(f"   - {deployment.get('id')} ({deployment.get('model')})")
-                return True
-            else:
-                print(f"❌ Не удалось получить deployments: {response.status_code}")
-                print(f"   Ответ: {response.text}")
-                return False
+        response = await http_client.get(url, headers=headers)
+        
+        if response.status_code == 200:
+            deployments = response.json()
+            log.info("✅ Доступные deployments:")
+            for deployment in deployments.get('data', []):
+                log.info(f"   - {deployment.get('id')} ({deployment.get('model')})")
+            return True
+        else:
+            log.error(f"❌ Не удалось получить deployments: {response.status_code}")
+            log.error(f"   Ответ: {response.text}")
+            return False
                 
     except Exception as e:
-        print(f"❌ Ошибка получения deployments: {e}")
+        log.error(f"❌ Ошибка получения deployments: {e}")
         return False
 
 async def main():
     """Основная функция тестирования."""
-    print("🚀 Тестирование конфигурации Azure OpenAI")
-    print("=" * 50)
+    log.info("🚀 Тестирование конфигурации Azure OpenAI")
+    log.info("=" * 50)
     
     # Загружаем конфигурацию
     config = load_env_config()
@@ -147,35 +135,44 @@ async def main():
         sys.exit(1)
     
     # Выводим конфигурацию
-    print_config(config)
+    log_config(config)
     
     # Проверяем обязательные параметры
     if not validate_config(config):
         sys.exit(1)
     
-    print()
-    
-    # Тестируем deployments
-    embedding_ok = await test_embedding_deployment(config)
-    print()
-    
-    chat_ok = await test_chat_deployment(config)
-    print()
+    # Один пул соединений на все проверки: TLS handshake выполняется один раз
+    async with httpx.AsyncClient() as http_client:
+        client = AsyncAzureOpenAI(
+            api_key=config['api_key'],
+            api_version=config['api_version'],
+            azure_endpoint=config['endpoint'],
+            http_client=http_client
+        )
+        
+        # Проверки независимы: выполняем параллельно (время = самая долгая из них)
+        embedding_ok, chat_ok, _ = await asyncio.gather(
+            test_embedding_deployment(config, client),
+            test_chat_deployment(config, client),
+            list_deployments(config, http_client),
+            return_exceptions=True
+        )
     
-    # Пытаемся получить список deployments
-    await list_deployments(config)
-    print()
+    # Исключение в проверке считается ошибкой
+    embedding_ok = embedding_ok is True
+    chat_ok = chat_ok is True
     
     # Итоговый результат
-    print("=" * 50)
+    log.info("=" * 50)
     if embedding_ok and chat_ok:
-        print("🎉 Все тесты прошли успешно! Azure OpenAI настроен правильно.")
+        log.info("🎉 Все тесты прошли успешно! Azure OpenAI настроен правильно.")
     else:
-        print("⚠️  Есть проблемы с конфигурацией Azure OpenAI.")
+        log.warning("⚠️  Есть проблемы с конфигурацией Azure OpenAI.")
         if not embedding_ok:
-            print("   - Проблема с embedding deployment")
+            log.warning("   - Проблема с embedding deployment")
         if not chat_ok:
-            print("   - Проблема с chat deployment")
+            log.warning("   - Проблема с chat deployment")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     asyncio.run(main()) 
\ No newline at end of file